@@ -16,15 +16,22 @@ from dotenv import load_dotenv
 BASE_DIR = Path(__file__).parent
 sys.path.append(str(BASE_DIR))
 
-from orchestrator import MedicalIDPOrchestrator
+from orchestrator import MedicalIDPOrchestrator, build_region_index
 from extraction_agent import ExtractionAgent
 from analysis_agent import AnalysisAgent
 from map_generator import MapGenerator
 
 # -----------------------------------------------------------------------------
-# Environment
+# Environment (.env is only re-read while the key is missing)
 # -----------------------------------------------------------------------------
-load_dotenv()
+def get_api_key() -> str | None:
+    # Not cached: a missing key must be picked up from .env on the next rerun
+    api_key = os.getenv("ANTHROPIC_API_KEY")
+    if not api_key:
+        load_dotenv()
+        api_key = os.getenv("ANTHROPIC_API_KEY")
+    return api_key
+
 
 # -----------------------------------------------------------------------------
 # Streamlit config
@@ -39,172 +46,143 @@ st.set_page_config(
 # -----------------------------------------------------------------------------
 # Styles
 # -----------------------------------------------------------------------------
-st.markdown("""
-<style>
+@st.cache_data(show_spinner=False)
+def get_css() -> str:
+    return (BASE_DIR / "styles.css").read_text(encoding="utf-8")
 
-/* Global text — VERY LIGHT */
-html, body, [class*="css"]  {
-    color: #9ca3af; /* Very light gray */
-    font-family: "Inter", "Segoe UI", sans-serif;
-}
 
-/* Main headers — soft skin / rose */
-.main-header {
-    font-size: 2.6rem;
-    font-weight: 800;
-    color: #c08484; /* Soft rose skin tone */
-    margin-bottom: 0.3rem;
-}
+st.markdown(f"<style>{get_css()}</style>", unsafe_allow_html=True)
 
-.sub-header {
-    font-size: 1.15rem;
-    color: #d6a8a8; /* Light warm blush */
-    margin-bottom: 2rem;
-}
+# -----------------------------------------------------------------------------
+# Cached resources (shared across sessions and reruns)
+# -----------------------------------------------------------------------------
+@st.cache_resource(show_spinner=False)
+def get_orchestrator(api_key: str) -> MedicalIDPOrchestrator:
+    return MedicalIDPOrchestrator(api_key)
 
-/* Section headers — lighter peach/rose */
-h1, h2, h3 {
-    color: #bfa5a0; /* Muted skin tone */
-    font-weight: 700;
-}
 
-/* Cards / metrics */
-.metric-card {
-    background: linear-gradient(135deg, #f8fafc, #eef2ff);
-    padding: 1.4rem;
-    border-radius: 0.6rem;
-    border-left: 5px solid #bfdbfe; /* Light blue */
-    color: #9ca3af;
-    box-shadow: 0 4px 12px rgba(0,0,0,0.03);
-}
+@st.cache_resource(show_spinner=False)
+def get_extractor(api_key: str) -> ExtractionAgent:
+    return ExtractionAgent(api_key)
 
-/* Alerts */
-.alert-critical {
-    background-color: #fff5f5;
-    border-left: 6px solid #fca5a5; /* Light red */
-    color: #9f1239;
-    padding: 1rem;
-    border-radius: 0.5rem;
-    margin: 1rem 0;
-}
 
-.alert-warning {
-    background-color: #fffbeb;
-    border-left: 6px solid #fde68a; /* Light amber */
-    color: #92400e;
-    padding: 1rem;
-    border-radius: 0.5rem;
-    margin: 1rem 0;
-}
+@st.cache_resource(show_spinner=False)
+def get_map_generator() -> MapGenerator:
+    return MapGenerator()
 
-.success-box {
-    background-color: #f0fdf4;
-    border-left: 6px solid #6ee7b7; /* Light green */
-    color: #065f46;
-    padding: 1rem;
-    border-radius: 0.5rem;
-    margin: 1rem 0;
-}
 
-/* Sidebar — soft skin tone */
-section[data-testid="stSidebar"] {
-    background: linear-gradient(
-        180deg,
-        #fff5f5,   /* very light rose */
-        #fce7e7,   /* blush */
-        #f8dcdc    /* skin tone */
-    );
+# Low-cardinality columns stored as categories (int codes instead of strings)
+CATEGORICAL_DTYPES = {
+    "region": "category",
+    "facility_type": "category",
+    "emergency_services": "category",
 }
 
-section[data-testid="stSidebar"] * {
-    color: #7f1d1d !important; /* muted rose */
-}
 
-/* Buttons — light white & soft yellow */
-button[kind="primary"] {
-    background: linear-gradient(
-        135deg,
-        #fffdf7,   /* soft white */
-        #fef3c7    /* pale yellow */
-    );
-    color: #92400e; /* warm brown text */
-    border-radius: 0.6rem;
-    font-weight: 600;
-    border: 1px solid #fde68a; /* light yellow border */
-    box-shadow: 0 4px 10px rgba(0,0,0,0.04);
-}
+def csv_version(path: Path) -> tuple[int, int]:
+    """Cheap dataset version key: (mtime_ns, size) from one stat call."""
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
 
-/* Hover — gentle warmth */
-button[kind="primary"]:hover {
-    background: linear-gradient(
-        135deg,
-        #fffbeb,
-        #fde68a
-    );
-    color: #78350f;
-    filter: none;
-}
 
-/* Secondary buttons (optional polish) */
-button {
-    background-color: #fffefc;
-    color: #9a3412;
-    border-radius: 0.6rem;
-    border: 1px solid #fde68a;
-}
+@st.cache_data(max_entries=2, show_spinner=False)
+def load_facilities(path: str, version: tuple[int, int]) -> pd.DataFrame:
+    """Read the CSV once per dataset version; `version` is only a cache key."""
+    return pd.read_csv(path, dtype=CATEGORICAL_DTYPES)
 
-/* Focus (accessibility friendly) */
-button:focus {
-    outline: none;
-    box-shadow: 0 0 0 3px rgba(253, 230, 138, 0.6);
-}
 
-/* Expanders */
-.streamlit-expanderHeader {
-    font-weight: 600;
-    color: #94a3b8;
-}
-
-/* Tables */
-thead tr th {
-    background-color: #bfdbfe !important;
-    color: #1e293b !important;
-}
+@st.cache_data(persist="disk", show_spinner=False)
+def build_desert_map_inputs(version: tuple[int, int], api_key: str) -> tuple[list, dict]:
+    """Extract + analyze every facility once per dataset version.
 
-/* Footer */
-.footer {
-    color: #cbd5e1;
-    font-size: 0.9rem;
-    text-align: center;
-    padding: 2rem;
-}
+    Keyed on the CSV version (not the DataFrame) so Streamlit only hashes a
+    short tuple; the frame is loaded under that same version.
+    """
+    df = load_facilities(str(DATA_PATH), version)
+    records = [
+        dict(zip(EXTRACTION_COLUMNS, row))
+        for row in df[EXTRACTION_COLUMNS].itertuples(index=False, name=None)
+    ]
+    extracted = get_extractor(api_key).extract_batch(records)
+    for data, record in zip(extracted, records):
+        data.update({
+            "region": record["region"],
+            "latitude": record["latitude"],
+            "longitude": record["longitude"]
+        })
+
+    analysis = AnalysisAgent().analyze_regional_coverage(extracted)
+    return extracted, analysis
+
+
+@st.cache_data(show_spinner=False)
+def dashboard_stats(version: tuple[int, int]) -> dict:
+    """Dashboard aggregates, computed once per dataset version."""
+    df = load_facilities(str(DATA_PATH), version)
+    return {
+        "facilities": len(df),
+        "regions": df["region"].nunique(),
+        "teaching": int((df["facility_type"] == "Teaching Hospital").sum()),
+        "emergency": int((df["emergency_services"] == "Yes").sum()),
+        "region_counts": df["region"].value_counts(),
+    }
+
+
+@st.cache_data(show_spinner=False)
+def region_index(version: tuple[int, int]) -> dict:
+    """Region -> row positions, built once per dataset version."""
+    return build_region_index(load_facilities(str(DATA_PATH), version))
+
+
+@st.cache_data(show_spinner=False)
+def render_facility_map_html(
+    version: tuple[int, int], facility_key: tuple[str, ...], _facilities: list
+) -> str:
+    """Render the query-result map; cached on the dataset version and matched facility IDs."""
+    map_generator = get_map_generator()
+    fmap = map_generator.create_facility_map(_facilities)
+    return map_generator.render_to_string(fmap)
+
+
+@st.cache_data(show_spinner=False)
+def render_desert_map_html(version: tuple[int, int], api_key: str) -> str:
+    """Render the nationwide desert map once per dataset version."""
+    extracted, analysis = build_desert_map_inputs(version, api_key)
+    map_generator = get_map_generator()
+    desert_map = map_generator.create_desert_map(
+        extracted, analysis["medical_deserts"]
+    )
+    return map_generator.render_to_string(desert_map)
 
-</style>
-""", unsafe_allow_html=True)
 
 # -----------------------------------------------------------------------------
 # Session state initialization
 # -----------------------------------------------------------------------------
-if "orchestrator" not in st.session_state:
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
-        st.error("⚠️ ANTHROPIC_API_KEY not found in .env file")
-        st.stop()
+api_key = get_api_key()
+if not api_key:
+    st.error("⚠️ ANTHROPIC_API_KEY not found in .env file")
+    st.stop()
 
-    st.session_state.orchestrator = MedicalIDPOrchestrator(api_key)
-    st.session_state.map_generator = MapGenerator()
+orchestrator = get_orchestrator(api_key)
 
 # -----------------------------------------------------------------------------
 # Load dataset (FIXED PATH)
 # -----------------------------------------------------------------------------
 DATA_PATH = BASE_DIR / "ghana_facilities.csv"
 
-if "facilities_df" not in st.session_state:
-    if not DATA_PATH.exists():
-        st.error(f"❌ Data file not found at: {DATA_PATH}")
-        st.stop()
+# Columns needed for extraction + map placement
+EXTRACTION_COLUMNS = [
+    "facility_id", "facility_name", "region", "latitude", "longitude",
+    "procedures_free_text", "equipment_free_text", "specialties_free_text"
+]
+
+if not DATA_PATH.exists():
+    st.error(f"❌ Data file not found at: {DATA_PATH}")
+    st.stop()
 
-    st.session_state.facilities_df = pd.read_csv(DATA_PATH)
+data_version = csv_version(DATA_PATH)
+facilities_df = load_facilities(str(DATA_PATH), data_version)
+stats = dashboard_stats(data_version)
 
 if "query_history" not in st.session_state:
     st.session_state.query_history = []
@@ -235,8 +213,8 @@ with st.sidebar:
         st.rerun()
 
     st.divider()
-    st.metric("Total Facilities", len(st.session_state.facilities_df))
-    st.metric("Regions Covered", st.session_state.facilities_df["region"].nunique())
+    st.metric("Total Facilities", stats["facilities"])
+    st.metric("Regions Covered", stats["regions"])
 
     st.divider()
     show_citations = st.checkbox("Show Citations", value=True)
@@ -265,8 +243,9 @@ with tab1:
     if st.button("🔍 Search", type="primary") and query:
         with st.spinner("Processing query..."):
             try:
-                result = st.session_state.orchestrator.process_query(
-                    query, st.session_state.facilities_df
+                result = orchestrator.process_query(
+                    query, facilities_df, region_index(data_version),
+                    dataset_version=data_version
                 )
 
                 st.markdown("### 💬 Response")
@@ -316,12 +295,11 @@ with tab1:
                 # Map (Windows safe)
                 # -------------------------
                 if show_map and result.get("matching_facilities"):
-                    map_path = BASE_DIR / "facility_map.html"
-                    fmap = st.session_state.map_generator.create_facility_map(
-                        [m["facility"] for m in result["matching_facilities"]]
+                    facilities = [m["facility"] for m in result["matching_facilities"]]
+                    facility_key = tuple(sorted(f["facility_id"] for f in facilities))
+                    st.components.v1.html(
+                        render_facility_map_html(data_version, facility_key, facilities), height=600
                     )
-                    st.session_state.map_generator.save_map(fmap, str(map_path))
-                    st.components.v1.html(map_path.read_text(encoding="utf-8"),height=600)
 
 
                 # -------------------------
@@ -331,11 +309,11 @@ with tab1:
 
                 if show_citations and result.get("citations"):
                     with st.expander("📖 Citations"):
-                        st.json(result["citations"])
+                        st.json(result["citations"]())
 
                 if show_trace and result.get("citation_report"):
                     with st.expander("🔍 Agent Trace"):
-                        st.code(result["citation_report"])
+                        st.code(result["citation_report"]())
 
             except Exception as e:
                 st.error(f"❌ Error: {e}")
@@ -350,44 +328,25 @@ with tab2:
 
     if st.button("Generate Map"):
         with st.spinner("Analyzing..."):
-            extractor = ExtractionAgent(os.getenv("ANTHROPIC_API_KEY"))
-            extracted = []
-            for _, row in st.session_state.facilities_df.iterrows():
-                data = extractor.extract_from_facility(row.to_dict())
-                data.update({
-                    "region": row["region"],
-                    "latitude": row["latitude"],
-                    "longitude": row["longitude"]
-                })
-                extracted.append(data)
-
-            analysis = AnalysisAgent().analyze_regional_coverage(extracted)
-            map_path = BASE_DIR / "desert_map.html"
-
-            desert_map = st.session_state.map_generator.create_desert_map(
-                extracted, analysis["medical_deserts"]
-            )
-            st.session_state.map_generator.save_map(desert_map, str(map_path))
-            st.components.v1.html(map_path.read_text(encoding="utf-8"),height=600)
+            st.components.v1.html(render_desert_map_html(data_version, api_key), height=600)
 
 # =============================================================================
 # TAB 3 — DASHBOARD
 # =============================================================================
 with tab3:
-    df = st.session_state.facilities_df
     c1, c2, c3, c4 = st.columns(4)
-    c1.metric("Facilities", len(df))
-    c2.metric("Regions", df["region"].nunique())
-    c3.metric("Teaching Hospitals", len(df[df["facility_type"] == "Teaching Hospital"]))
-    c4.metric("Emergency Services", len(df[df["emergency_services"] == "Yes"]))
+    c1.metric("Facilities", stats["facilities"])
+    c2.metric("Regions", stats["regions"])
+    c3.metric("Teaching Hospitals", stats["teaching"])
+    c4.metric("Emergency Services", stats["emergency"])
 
-    st.bar_chart(df["region"].value_counts())
+    st.bar_chart(stats["region_counts"])
 
 # =============================================================================
 # TAB 4 — DATASET
 # =============================================================================
 with tab4:
-    st.dataframe(st.session_state.facilities_df, use_container_width=True)
+    st.dataframe(facilities_df, use_container_width=True)
 
 # -----------------------------------------------------------------------------
 # Footer
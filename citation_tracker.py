@@ -3,13 +3,26 @@ Citation Tracker - Tracks data sources used in each agent reasoning step
 Provides row-level and step-level citations for transparency
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Sequence
 from dataclasses import dataclass, field
 from datetime import datetime
-import json
+from collections import defaultdict
+from itertools import chain
+import io
+import orjson
 
+# orjson only supports 2-space indentation; numpy scalars can leak in from
+# DataFrame rows and non-string keys from ad-hoc step payloads
+_JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
 
-@dataclass
+
+def _dumps(data: Any, indent: bool = True) -> str:
+    """Serialize to a JSON string with orjson"""
+    option = _JSON_OPTIONS | orjson.OPT_INDENT_2 if indent else _JSON_OPTIONS
+    return orjson.dumps(data, option=option).decode()
+
+
+@dataclass(slots=True)
 class Citation:
     """Individual citation linking a claim to source data"""
     source_type: str  # 'facility_row', 'aggregation', 'inference'
@@ -32,7 +45,7 @@ class Citation:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class AgentStep:
     """Records a single reasoning step in the agent workflow"""
     step_number: int
@@ -44,10 +57,26 @@ class AgentStep:
     timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
     duration_ms: Optional[float] = None
     
+    # Memoized pretty-printed payloads for the citation report
+    _input_json: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    _output_json: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    
     def add_citation(self, citation: Citation):
         """Add a citation to this step"""
         self.citations.append(citation)
     
+    def input_json(self) -> str:
+        """input_data as indented JSON, serialized once"""
+        if self._input_json is None:
+            self._input_json = _dumps(self.input_data)
+        return self._input_json
+    
+    def output_json(self) -> str:
+        """output_data as indented JSON, serialized once per end_step"""
+        if self._output_json is None:
+            self._output_json = _dumps(self.output_data)
+        return self._output_json
+    
     def to_dict(self) -> Dict[str, Any]:
         return {
             'step_number': self.step_number,
@@ -67,6 +96,8 @@ class CitationTracker:
     def __init__(self):
         self.steps: List[AgentStep] = []
         self.current_step_number = 0
+        self._step_index: Dict[int, AgentStep] = {}
+        self._by_facility: Dict[str, List[Citation]] = defaultdict(list)
     
     def start_step(self, step_name: str, step_description: str, input_data: Dict[str, Any]) -> int:
         """Start tracking a new agent step"""
@@ -79,6 +110,7 @@ class CitationTracker:
             output_data={}
         )
         self.steps.append(step)
+        self._step_index[self.current_step_number] = step
         return self.current_step_number
     
     def end_step(self, step_number: int, output_data: Dict[str, Any], duration_ms: Optional[float] = None):
@@ -87,12 +119,15 @@ class CitationTracker:
         if step:
             step.output_data = output_data
             step.duration_ms = duration_ms
+            step._output_json = None
     
     def add_citation_to_step(self, step_number: int, citation: Citation):
         """Add a citation to a specific step"""
         step = self._get_step(step_number)
         if step:
             step.add_citation(citation)
+            if citation.facility_id:
+                self._by_facility[citation.facility_id].append(citation)
     
     def add_facility_citation(
         self,
@@ -116,74 +151,103 @@ class CitationTracker:
         )
         self.add_citation_to_step(step_number, citation)
     
+    def add_facility_citations(
+        self,
+        step_number: int,
+        facility_ids: Sequence[str],
+        facility_names: Sequence[str],
+        field_names: Sequence[str],
+        field_values: Sequence[str],
+        row_numbers: Sequence[int],
+        confidences: Sequence[float]
+    ):
+        """Add many facility row citations from parallel columns in one call"""
+        step = self._get_step(step_number)
+        if not step:
+            return
+        citations = [
+            Citation('facility_row', *values)
+            for values in zip(facility_ids, facility_names, field_names,
+                              field_values, row_numbers, confidences)
+        ]
+        step.citations.extend(citations)
+        for citation in citations:
+            if citation.facility_id:
+                self._by_facility[citation.facility_id].append(citation)
+    
     def _get_step(self, step_number: int) -> Optional[AgentStep]:
         """Get a step by its number"""
-        for step in self.steps:
-            if step.step_number == step_number:
-                return step
-        return None
+        return self._step_index.get(step_number)
+    
+    def iter_citations(self) -> Iterator[Citation]:
+        """Iterate over all citations across all steps without copying"""
+        return chain.from_iterable(step.citations for step in self.steps)
     
     def get_all_citations(self) -> List[Citation]:
         """Get all citations across all steps"""
-        all_citations = []
-        for step in self.steps:
-            all_citations.extend(step.citations)
-        return all_citations
+        return list(self.iter_citations())
+    
+    def citation_count(self) -> int:
+        """Total number of citations across all steps"""
+        return sum(len(step.citations) for step in self.steps)
     
     def get_citations_by_facility(self, facility_id: str) -> List[Citation]:
         """Get all citations for a specific facility"""
-        return [
-            c for c in self.get_all_citations()
-            if c.facility_id == facility_id
-        ]
+        return list(self._by_facility.get(facility_id, []))
     
     def to_dict(self) -> Dict[str, Any]:
         """Export full trace as dictionary"""
         return {
             'total_steps': len(self.steps),
             'steps': [step.to_dict() for step in self.steps],
-            'total_citations': len(self.get_all_citations())
+            'total_citations': self.citation_count()
         }
     
     def to_json(self, indent: int = 2) -> str:
-        """Export trace as JSON string"""
-        return json.dumps(self.to_dict(), indent=indent)
+        """Export trace as JSON string (any truthy indent uses 2 spaces)"""
+        return _dumps(self.to_dict(), indent=bool(indent))
     
     def generate_citation_report(self) -> str:
         """Generate a human-readable citation report"""
-        report = ["=" * 80]
-        report.append("AGENT EXECUTION TRACE WITH CITATIONS")
-        report.append("=" * 80)
-        report.append(f"\nTotal Steps: {len(self.steps)}")
-        report.append(f"Total Citations: {len(self.get_all_citations())}\n")
+        buf = io.StringIO()
+        
+        def line(text: str = "") -> None:
+            buf.write(text)
+            buf.write("\n")
+        
+        line("=" * 80)
+        line("AGENT EXECUTION TRACE WITH CITATIONS")
+        line("=" * 80)
+        line(f"\nTotal Steps: {len(self.steps)}")
+        line(f"Total Citations: {self.citation_count()}\n")
         
         for step in self.steps:
-            report.append(f"\n{'─' * 80}")
-            report.append(f"Step {step.step_number}: {step.step_name}")
-            report.append(f"{'─' * 80}")
-            report.append(f"Description: {step.step_description}")
-            report.append(f"Timestamp: {step.timestamp}")
+            line(f"\n{'─' * 80}")
+            line(f"Step {step.step_number}: {step.step_name}")
+            line(f"{'─' * 80}")
+            line(f"Description: {step.step_description}")
+            line(f"Timestamp: {step.timestamp}")
             if step.duration_ms:
-                report.append(f"Duration: {step.duration_ms:.2f}ms")
+                line(f"Duration: {step.duration_ms:.2f}ms")
             
-            report.append(f"\nInput: {json.dumps(step.input_data, indent=2)}")
-            report.append(f"\nOutput: {json.dumps(step.output_data, indent=2)}")
+            line(f"\nInput: {step.input_json()}")
+            line(f"\nOutput: {step.output_json()}")
             
             if step.citations:
-                report.append(f"\nCitations ({len(step.citations)}):")
+                line(f"\nCitations ({len(step.citations)}):")
                 for i, citation in enumerate(step.citations, 1):
-                    report.append(f"  [{i}] {citation.source_type}")
+                    line(f"  [{i}] {citation.source_type}")
                     if citation.facility_name:
-                        report.append(f"      Facility: {citation.facility_name} ({citation.facility_id})")
+                        line(f"      Facility: {citation.facility_name} ({citation.facility_id})")
                     if citation.field_name:
-                        report.append(f"      Field: {citation.field_name}")
-                        report.append(f"      Value: {citation.field_value[:100]}...")
-                    report.append(f"      Confidence: {citation.confidence:.2f}")
+                        line(f"      Field: {citation.field_name}")
+                        line(f"      Value: {citation.field_value[:100]}...")
+                    line(f"      Confidence: {citation.confidence:.2f}")
             else:
-                report.append("\nNo citations for this step")
+                line("\nNo citations for this step")
         
-        report.append(f"\n{'=' * 80}\n")
-        return "\n".join(report)
+        buf.write(f"\n{'=' * 80}\n")
+        return buf.getvalue()
 
 
 # Example usage
@@ -20,6 +20,27 @@ from analysis_agent import AnalysisAgent
 
 # Load environment
 load_dotenv()
+API_KEY = os.getenv('ANTHROPIC_API_KEY')
+
+DATA_PATH = Path(__file__).parent / 'ghana_facilities.csv'
+
+# Low-cardinality columns stored as categories (int codes instead of strings)
+CATEGORICAL_DTYPES = {
+    'region': 'category',
+    'facility_type': 'category',
+    'emergency_services': 'category'
+}
+
+SEVERITY_SYMBOLS = {
+    'critical': '🔴',
+    'severe': '🟠',
+    'moderate': '🟡'
+}
+
+def load_facilities(path: Path = DATA_PATH) -> pd.DataFrame:
+    """Read the facility CSV through a 1 MB buffered reader"""
+    with open(path, 'rb', buffering=1 << 20) as f:
+        return pd.read_csv(f, dtype=CATEGORICAL_DTYPES, engine='c')
 
 def print_header():
     """Print demo header"""
@@ -31,20 +52,25 @@ def print_header():
 
 def print_result(result):
     """Pretty print query results"""
+    # Normalize result sections ONCE
+    analysis = result.get('analysis_results') or {}
+    matches = result.get('matching_facilities') or []
+    deserts = analysis.get('medical_deserts') or []
+    gaps = analysis.get('capability_gaps') or []
+
     print("\n" + "─" * 80)
     print("RESPONSE:")
-    analysis = result.get('analysis_results') or {}
     print("─" * 80)
     print(result['response'])
     print()
     
     # Show matching facilities
-    if result.get('matching_facilities'):
+    if matches:
         print("\n" + "─" * 80)
-        print(f"MATCHING FACILITIES: {len(result['matching_facilities'])}")
+        print(f"MATCHING FACILITIES: {len(matches)}")
         print("─" * 80)
         
-        for i, match in enumerate(result['matching_facilities'][:5], 1):
+        for i, match in enumerate(matches[:5], 1):
             facility = match['facility']
             print(f"\n{i}. {facility['facility_name']}")
             print(f"   Region: {facility['region']}")
@@ -54,23 +80,15 @@ def print_result(result):
             
             if facility.get('anomalies'):
                 print(f"   ⚠️  Issues: {'; '.join(facility['anomalies'][:2])}")
-    
-    # Normalize analysis results ONCE
-    analysis = result.get('analysis_results') or {}
 
     # Show medical deserts
-    if analysis.get('medical_deserts'):
-        deserts = analysis['medical_deserts']
+    if deserts:
         print("\n" + "─" * 80)
         print(f"MEDICAL DESERTS: {len(deserts)}")
         print("─" * 80)
         
         for desert in deserts[:5]:
-            severity_symbol = {
-                'critical': '🔴',
-                'severe': '🟠',
-                'moderate': '🟡'
-            }.get(desert.severity, '⚪')
+            severity_symbol = SEVERITY_SYMBOLS.get(desert.severity, '⚪')
             
             print(f"\n{severity_symbol} {desert.region} - {desert.severity.upper()}")
             print(f"   Missing {len(desert.missing_capabilities)} capabilities")
@@ -78,8 +96,7 @@ def print_result(result):
                 print(f"   Top gaps: {', '.join(desert.missing_capabilities[:3])}")
 
     # Show capability gaps
-    if analysis.get('capability_gaps'):
-        gaps = analysis['capability_gaps']
+    if gaps:
         print("\n" + "─" * 80)
         print(f"CAPABILITY GAPS: {len(gaps)}")
         print("─" * 80)
@@ -100,7 +117,7 @@ def run_demo():
     print_header()
     
     # Check API key
-    api_key = os.getenv('ANTHROPIC_API_KEY')
+    api_key = API_KEY
     if not api_key:
         print("❌ ERROR: ANTHROPIC_API_KEY not found in environment")
         print("Please set it in .env file")
@@ -108,13 +125,11 @@ def run_demo():
     
     # Load data
     print("Loading Ghana facilities data...")
-    data_path = Path(__file__).parent / 'ghana_facilities.csv'
-    
-    if not data_path.exists():
-        print(f"❌ ERROR: Data file not found at {data_path}")
+    if not DATA_PATH.exists():
+        print(f"❌ ERROR: Data file not found at {DATA_PATH}")
         return
     
-    facilities_df = pd.read_csv(data_path)
+    facilities_df = load_facilities()
     print(f"✓ Loaded {len(facilities_df)} facilities from {len(facilities_df['region'].unique())} regions\n")
     
     # Initialize orchestrator
@@ -181,7 +196,7 @@ def run_demo():
                 print("\n" + "=" * 80)
                 print("CITATION TRACE")
                 print("=" * 80)
-                print(result['citation_report'])
+                print(result['citation_report']())
             
             print("\n" + "=" * 80)
             print()
@@ -195,13 +210,16 @@ def run_demo():
 
 def run_single_query(query: str):
     """Run a single query and print results"""
-    api_key = os.getenv('ANTHROPIC_API_KEY')
+    api_key = API_KEY
     if not api_key:
         print("❌ ERROR: ANTHROPIC_API_KEY not found")
         return
     
-    data_path = Path(__file__).parent / 'data' / 'ghana_facilities.csv'
-    facilities_df = pd.read_csv(data_path)
+    if not DATA_PATH.exists():
+        print(f"❌ ERROR: Data file not found at {DATA_PATH}")
+        return
+    
+    facilities_df = load_facilities()
     
     orchestrator = MedicalIDPOrchestrator(api_key)
     
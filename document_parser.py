@@ -3,24 +3,40 @@ Intelligent Document Parser for Medical Facilities
 Extracts structured medical capabilities from unstructured text
 """
 
+import os
 import re
-from typing import List, Dict, Any, Optional
-from pydantic import BaseModel, Field
-from dataclasses import dataclass
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Union
+from dataclasses import dataclass, field
+import numpy as np
 import pandas as pd
 
+try:
+    import hyperscan  # optional DFA multi-pattern engine
+except ImportError:
+    hyperscan = None
 
-class MedicalCapability(BaseModel):
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv  # optional multithreaded CSV reader
+except ImportError:
+    pa = pa_csv = None
+
+
+@dataclass(slots=True)
+class MedicalCapability:
     """Extracted medical capability with citation"""
-    capability_type: str = Field(description="Type: specialty, equipment, procedure, or staffing")
-    name: str = Field(description="Name of the capability")
-    status: str = Field(description="Status: available, limited, unavailable, or broken")
-    confidence: float = Field(description="Confidence score 0-1")
-    source_text: str = Field(description="Original text this was extracted from")
-    facility_id: str = Field(description="Source facility ID")
+    capability_type: str  # specialty, equipment, procedure, or staffing
+    name: str
+    status: str  # available, limited, unavailable, or broken
+    confidence: float  # 0-1
+    source_text: str  # original text this was extracted from
+    facility_id: str
 
 
-class FacilityProfile(BaseModel):
+@dataclass(slots=True)
+class FacilityProfile:
     """Complete profile of a medical facility"""
     facility_id: str
     facility_name: str
@@ -30,17 +46,17 @@ class FacilityProfile(BaseModel):
     facility_type: str
     
     # Extracted capabilities
-    specialties: List[str] = []
-    equipment: List[str] = []
-    procedures: List[str] = []
+    specialties: List[str] = field(default_factory=list)
+    equipment: List[str] = field(default_factory=list)
+    procedures: List[str] = field(default_factory=list)
     
     # Critical issues
-    gaps: List[str] = []
-    urgent_needs: List[str] = []
-    suspicious_claims: List[str] = []
+    gaps: List[str] = field(default_factory=list)
+    urgent_needs: List[str] = field(default_factory=list)
+    suspicious_claims: List[str] = field(default_factory=list)
     
     # All extracted capabilities with citations
-    capabilities: List[MedicalCapability] = []
+    capabilities: List[MedicalCapability] = field(default_factory=list)
     
     # Computed metrics
     capability_score: float = 0.0
@@ -58,6 +74,270 @@ class ExtractionStep:
     timestamp: str
 
 
+# Medical terminology patterns
+SPECIALTY_PATTERNS = [re.compile(p, re.IGNORECASE) for p in [
+    r'cardiology', r'neurosurgery', r'oncology', r'pediatrics',
+    r'orthopedics', r'obstetrics', r'internal medicine', r'emergency',
+    r'ophthalmology', r'dentistry', r'general medicine', r'surgery'
+]]
+
+EQUIPMENT_PATTERNS = [re.compile(p, re.IGNORECASE) for p in [
+    r'MRI', r'CT [Ss]canner', r'X-[Rr]ay', r'[Uu]ltrasound',
+    r'ventilator', r'ICU', r'operating theater', r'catheterization lab',
+    r'blood bank', r'laboratory', r'ambulance'
+]]
+
+PROCEDURE_PATTERNS = [re.compile(p, re.IGNORECASE) for p in [
+    r'surgery', r'cesarean', r'chemotherapy', r'dialysis',
+    r'trauma care', r'intensive care', r'delivery', r'deliveries',
+    r'immunization', r'vaccination', r'transplant'
+]]
+
+
+def _scan(patterns: List[re.Pattern], text: str) -> List[tuple]:
+    """
+    One finditer per pattern over text.
+    Returns (pattern_index, start, end, matched_text): non-overlapping per
+    pattern, ordered by pattern, then position.
+    """
+    return [
+        (i, m.start(), m.end(), m.group())
+        for i, pattern in enumerate(patterns)
+        for m in pattern.finditer(text)
+    ]
+
+
+_REGEX_METACHARS = frozenset('.^$*+?{}[]\\|()')
+
+
+def _literal_forms(patterns: List[re.Pattern]) -> Optional[List[str]]:
+    """
+    Lowercase literal equivalents of case-insensitive patterns, with case
+    classes like [Ss] collapsed to one letter. None if any pattern needs
+    the regex engine.
+    """
+    literals = []
+    for pattern in patterns:
+        text = re.sub(r'\[([A-Z])([a-z])\]',
+                      lambda m: m.group(2) if m.group(1).lower() == m.group(2) else m.group(0),
+                      pattern.pattern)
+        if any(c in _REGEX_METACHARS for c in text):
+            return None
+        literals.append(text.lower())
+    return literals
+
+
+def _scan_literals(literals: List[str], text_lower: str) -> List[tuple]:
+    """
+    _scan for plain literals over lowercased text using str.find.
+    Same (pattern_index, start, end, matched_text) hits as per-pattern
+    finditer: non-overlapping, ordered by pattern then position.
+    """
+    hits = []
+    for i, literal in enumerate(literals):
+        pos = text_lower.find(literal)
+        while pos != -1:
+            end = pos + len(literal)
+            hits.append((i, pos, end, literal))
+            pos = text_lower.find(literal, end)
+    return hits
+
+
+SPECIALTY_LITERALS = _literal_forms(SPECIALTY_PATTERNS)
+EQUIPMENT_LITERALS = _literal_forms(EQUIPMENT_PATTERNS)
+
+
+def _build_notes_database():
+    """
+    Compile specialty + equipment patterns into one Hyperscan database.
+    Pattern ids [0, len(SPECIALTY_PATTERNS)) are specialties, the rest
+    equipment. Returns None when hyperscan is not installed.
+    """
+    if hyperscan is None:
+        return None
+    
+    patterns = SPECIALTY_PATTERNS + EQUIPMENT_PATTERNS
+    database = hyperscan.Database()
+    database.compile(
+        expressions=[p.pattern.encode() for p in patterns],
+        ids=list(range(len(patterns))),
+        elements=len(patterns),
+        flags=[hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SOM_LEFTMOST] * len(patterns)
+    )
+    return database
+
+
+NOTES_DATABASE = _build_notes_database()
+
+
+def _scan_notes(text: str) -> tuple:
+    """
+    Find specialty and equipment mentions in lowercased text.
+    Returns (specialty_hits, equipment_hits) in the _scan format. Uses
+    Hyperscan when available (ASCII text only, so byte offsets equal
+    string offsets), else str.find for literal vocabularies, else one
+    finditer per pattern.
+    """
+    if NOTES_DATABASE is None or not text.isascii():
+        specialty_hits = (_scan_literals(SPECIALTY_LITERALS, text) if SPECIALTY_LITERALS is not None
+                          else _scan(SPECIALTY_PATTERNS, text))
+        equipment_hits = (_scan_literals(EQUIPMENT_LITERALS, text) if EQUIPMENT_LITERALS is not None
+                          else _scan(EQUIPMENT_PATTERNS, text))
+        return specialty_hits, equipment_hits
+    
+    hits = []
+    
+    def on_match(pattern_id, start, end, flags, context):
+        hits.append((pattern_id, start, end, text[start:end]))
+    
+    NOTES_DATABASE.scan(text.encode('ascii'), match_event_handler=on_match)
+    hits.sort(key=lambda hit: (hit[0], hit[1]))
+    
+    split = len(SPECIALTY_PATTERNS)
+    specialty_hits = [hit for hit in hits if hit[0] < split]
+    equipment_hits = [(i - split, start, end, match) for i, start, end, match in hits if i >= split]
+    return specialty_hits, equipment_hits
+
+# Negative indicators
+SHORTAGE_PATTERNS = [re.compile(p, re.IGNORECASE) for p in [
+    r'short on', r'need more', r'no (.*?) available',
+    r'limited (.*?)', r'broke down', r'awaiting replacement',
+    r'struggling with', r'only \d+ (.*?) on staff'
+]]
+
+# Gap detection: (pattern over lowercased text, message template)
+SHORTAGE_INDICATORS = [
+    (re.compile(r'short on (.*?)[\.,]'), 'Staff shortage: {}'),
+    (re.compile(r'need more (.*?)[\.,]'), 'Urgent need: {}'),
+    (re.compile(r'no (.*?) available'), 'Missing: {}'),
+    (re.compile(r'no (.*?) on (permanent )?staff'), 'No {} on staff'),
+    (re.compile(r'only (\d+) (.*?) on staff'), 'Limited {}: only {} available'),
+]
+
+# Critical equipment: (display name, lowercased name, "no X" pattern, "X ... broke" pattern)
+# Markers that flag equipment mentioned nearby in the notes as broken
+BROKEN_MARKERS = re.compile(r'broke|not working')
+
+CRITICAL_EQUIPMENT = [
+    (equip, equip.lower(), re.compile(f'no {equip.lower()}'), re.compile(f'{equip.lower()}.*?broke'))
+    for equip in ['CT scanner', 'MRI', 'ICU', 'operating theater']
+]
+
+# Equipment claims to verify per facility type: (lowercased name, message)
+SUSPICIOUS_EQUIPMENT = {
+    "District Hospital": [
+        (eq.lower(), f"District hospital claims {eq} - verify accuracy")
+        for eq in ['MRI', 'CT Scanner', 'Cardiac Catheterization']
+    ]
+}
+
+# Capability score weight per facility type
+FACILITY_TYPE_WEIGHTS = {
+    "Teaching Hospital": 1.0,
+    "Regional Hospital": 0.7,
+    "District Hospital": 0.4,
+    "Mission Hospital": 0.5
+}
+DEFAULT_TYPE_WEIGHT = 0.3
+
+
+# Equipment whose absence counts towards desert risk (lowercased)
+CRITICAL_MISSING_LOWER = [c.lower() for c in ['CT Scanner', 'MRI', 'ICU', 'Operating Theater']]
+
+
+# Free-text columns read for every facility
+TEXT_FIELDS = ['specialties', 'equipment', 'procedures', 'staff_notes']
+
+# Repeated facility labels (few distinct values across many rows)
+LABEL_FIELDS = ['region', 'district', 'facility_type']
+
+# Numeric columns (float, as pandas reads them once a cell is blank)
+NUMERIC_FIELDS = ['latitude', 'longitude', 'staff_count', 'bed_capacity']
+
+# Comma-separated columns parsed into capability lists -> capability type
+STRUCTURED_FIELDS = {
+    'specialties': 'specialty',
+    'equipment': 'equipment',
+    'procedures': 'procedure'
+}
+
+
+def _arrow_convert_options():
+    """
+    Arrow CSV options for the streaming reader. Arrow infers column types
+    from the first block only, so known columns are pinned: a later block
+    with blank cells cannot then disagree with the first.
+    """
+    column_types = {name: pa.string() for name in TEXT_FIELDS + LABEL_FIELDS}
+    column_types.update((name, pa.float64()) for name in NUMERIC_FIELDS)
+    return pa_csv.ConvertOptions(strings_can_be_null=True, column_types=column_types)
+
+
+def _arrow_to_frame(table) -> pd.DataFrame:
+    """Arrow table -> DataFrame with missing text cells as NaN, like pd.read_csv"""
+    df = table.to_pandas()
+    
+    # Arrow nulls arrive as None; match pandas' NaN (str() -> 'nan')
+    for name in TEXT_FIELDS + LABEL_FIELDS:
+        if name in df.columns:
+            df[name] = df[name].where(df[name].notna(), np.nan)
+    return df
+
+
+def _iter_facility_csv(csv_path: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    """
+    Read the facility CSV in frames of chunksize rows, with Arrow's C++
+    streaming reader when pyarrow is installed, else pd.read_csv. Missing
+    text cells are NaN either way. Arrow yields byte-sized blocks, so they
+    are regrouped by row count.
+    """
+    if pa_csv is None:
+        yield from pd.read_csv(csv_path, chunksize=chunksize)
+        return
+    
+    reader = pa_csv.open_csv(csv_path, convert_options=_arrow_convert_options())
+    pending = pa.Table.from_batches([], schema=reader.schema)
+    for batch in reader:
+        pending = pa.concat_tables([pending, pa.Table.from_batches([batch])])
+        while pending.num_rows >= chunksize:
+            yield _arrow_to_frame(pending.slice(0, chunksize))
+            pending = pending.slice(chunksize)
+    if pending.num_rows:
+        yield _arrow_to_frame(pending)
+
+
+def _equipment_text(profile: FacilityProfile) -> str:
+    """Lowercased equipment names joined for single substring checks"""
+    return '\n'.join({e.lower() for e in profile.equipment})
+
+
+def _span_within(spans: List[tuple], starts: List[int], lo: int, hi: int) -> bool:
+    """True if one of the sorted, non-overlapping spans lies inside [lo, hi)"""
+    i = bisect_left(starts, lo)
+    while i < len(starts) and starts[i] < hi:
+        if spans[i][1] <= hi:
+            return True
+        i += 1
+    return False
+
+
+def _missing_critical_count(profile: FacilityProfile) -> int:
+    """Number of CRITICAL_MISSING_LOWER items absent from the equipment"""
+    equipment_text = _equipment_text(profile)
+    return sum(critical not in equipment_text for critical in CRITICAL_MISSING_LOWER)
+
+
+def _split_field(text: str) -> List[str]:
+    """Split a comma-separated field into stripped items ([] when empty)"""
+    return [item.strip() for item in text.split(',')] if text else []
+
+
+def _split_column(texts: pd.Series) -> List[List[str]]:
+    """Column-wise _split_field over a string Series"""
+    parts = texts.str.strip().str.split(r'\s*,\s*', regex=True)
+    return [items if text else [] for text, items in zip(texts.tolist(), parts.tolist())]
+
+
 class IntelligentDocumentParser:
     """
     Parses unstructured medical facility data using pattern matching
@@ -65,38 +345,31 @@ class IntelligentDocumentParser:
     """
     
     def __init__(self):
-        # Medical terminology patterns
-        self.specialty_patterns = [
-            r'cardiology', r'neurosurgery', r'oncology', r'pediatrics',
-            r'orthopedics', r'obstetrics', r'internal medicine', r'emergency',
-            r'ophthalmology', r'dentistry', r'general medicine', r'surgery'
-        ]
-        
-        self.equipment_patterns = [
-            r'MRI', r'CT [Ss]canner', r'X-[Rr]ay', r'[Uu]ltrasound',
-            r'ventilator', r'ICU', r'operating theater', r'catheterization lab',
-            r'blood bank', r'laboratory', r'ambulance'
-        ]
-        
-        self.procedure_patterns = [
-            r'surgery', r'cesarean', r'chemotherapy', r'dialysis',
-            r'trauma care', r'intensive care', r'delivery', r'deliveries',
-            r'immunization', r'vaccination', r'transplant'
-        ]
+        # Medical terminology patterns (compiled once at module import)
+        self.specialty_patterns = SPECIALTY_PATTERNS
+        self.equipment_patterns = EQUIPMENT_PATTERNS
+        self.procedure_patterns = PROCEDURE_PATTERNS
         
         # Negative indicators
-        self.shortage_patterns = [
-            r'short on', r'need more', r'no (.*?) available',
-            r'limited (.*?)', r'broke down', r'awaiting replacement',
-            r'struggling with', r'only \d+ (.*?) on staff'
-        ]
+        self.shortage_patterns = SHORTAGE_PATTERNS
+        
+        # Facility-type specializations
+        self.suspicious_equipment = SUSPICIOUS_EQUIPMENT
         
         self.citation_log: List[ExtractionStep] = []
         
-    def extract_capabilities(self, row: pd.Series) -> FacilityProfile:
+    def extract_capabilities(self, row: Union[pd.Series, Dict[str, Any]],
+                             split_fields: Optional[Dict[str, List[str]]] = None,
+                             notes_lower: Optional[str] = None,
+                             score: bool = True) -> FacilityProfile:
         """
         Extract all medical capabilities from a facility record
         Returns a complete facility profile with citations
+        
+        split_fields / notes_lower may be precomputed column-wise by the
+        caller (see parse_facility_dataset); otherwise they are derived
+        from the row. score=False leaves scoring to a later score_profiles
+        pass over many profiles.
         """
         facility_id = row['facility_id']
         
@@ -118,142 +391,123 @@ class IntelligentDocumentParser:
             'staff_notes': str(row.get('staff_notes', ''))
         }
         
-        combined_text = ' '.join(text_fields.values())
+        if split_fields is None:
+            split_fields = {name: _split_field(text_fields[name]) for name in STRUCTURED_FIELDS}
+        
+        if notes_lower is None:
+            notes_lower = text_fields['staff_notes'].lower()
+        
+        # Lowercased once here and shared by the notes and gap passes
+        combined_text_lower = ' '.join([
+            text_fields['specialties'].lower(),
+            text_fields['equipment'].lower(),
+            text_fields['procedures'].lower(),
+            notes_lower
+        ])
         
         # Step 1: Extract structured fields
-        self._extract_structured_fields(profile, text_fields, facility_id)
+        self._extract_structured_fields(profile, text_fields, split_fields, facility_id)
         
         # Step 2: Extract capabilities from unstructured notes
-        self._extract_from_notes(profile, text_fields['staff_notes'], facility_id)
+        self._extract_from_notes(profile, text_fields['staff_notes'], facility_id, notes_lower)
         
         # Step 3: Detect gaps and issues
-        self._detect_gaps(profile, combined_text, facility_id)
+        self._detect_gaps(profile, combined_text_lower, facility_id)
         
         # Step 4: Compute scores
-        self._compute_scores(profile)
+        if score:
+            self._compute_scores(profile)
         
         return profile
     
     def _extract_structured_fields(self, profile: FacilityProfile, 
                                    text_fields: Dict[str, str], 
+                                   split_fields: Dict[str, List[str]],
                                    facility_id: str):
         """Extract from structured CSV columns"""
         
-        # Parse specialties
-        if text_fields['specialties']:
-            specialties = [s.strip() for s in text_fields['specialties'].split(',')]
-            profile.specialties = specialties
+        for field_name, capability_type in STRUCTURED_FIELDS.items():
+            items = split_fields[field_name]
+            if not items:
+                continue
             
-            for spec in specialties:
-                profile.capabilities.append(MedicalCapability(
-                    capability_type="specialty",
-                    name=spec,
+            setattr(profile, field_name, items)
+            source_text = text_fields[field_name]
+            profile.capabilities.extend(
+                MedicalCapability(
+                    capability_type=capability_type,
+                    name=item,
                     status="available",
                     confidence=0.95,
-                    source_text=text_fields['specialties'],
+                    source_text=source_text,
                     facility_id=facility_id
-                ))
-        
-        # Parse equipment
-        if text_fields['equipment']:
-            equipment = [e.strip() for e in text_fields['equipment'].split(',')]
-            profile.equipment = equipment
-            
-            for eq in equipment:
-                profile.capabilities.append(MedicalCapability(
-                    capability_type="equipment",
-                    name=eq,
-                    status="available",
-                    confidence=0.95,
-                    source_text=text_fields['equipment'],
-                    facility_id=facility_id
-                ))
-        
-        # Parse procedures
-        if text_fields['procedures']:
-            procedures = [p.strip() for p in text_fields['procedures'].split(',')]
-            profile.procedures = procedures
-            
-            for proc in procedures:
-                profile.capabilities.append(MedicalCapability(
-                    capability_type="procedure",
-                    name=proc,
-                    status="available",
-                    confidence=0.95,
-                    source_text=text_fields['procedures'],
-                    facility_id=facility_id
-                ))
+                )
+                for item in items
+            )
     
     def _extract_from_notes(self, profile: FacilityProfile, 
                            notes: str, 
-                           facility_id: str):
+                           facility_id: str,
+                           notes_lower: Optional[str] = None):
         """Extract additional capabilities mentioned in unstructured notes"""
         
         if not notes or notes == 'nan':
             return
         
-        notes_lower = notes.lower()
+        if notes_lower is None:
+            notes_lower = notes.lower()
+        specialty_hits, equipment_hits = _scan_notes(notes_lower)
         
         # Extract specialties mentioned in notes
-        for pattern in self.specialty_patterns:
-            matches = re.finditer(pattern, notes_lower, re.IGNORECASE)
-            for match in matches:
-                specialty = match.group(0)
-                if specialty not in [s.lower() for s in profile.specialties]:
-                    profile.capabilities.append(MedicalCapability(
-                        capability_type="specialty",
-                        name=specialty.title(),
-                        status="mentioned",
-                        confidence=0.7,
-                        source_text=notes,
-                        facility_id=facility_id
-                    ))
-        
-        # Extract equipment mentioned in notes
-        for pattern in self.equipment_patterns:
-            matches = re.finditer(pattern, notes_lower, re.IGNORECASE)
-            for match in matches:
-                equipment = match.group(0)
-                
-                # Check status context
-                context_start = max(0, match.start() - 50)
-                context_end = min(len(notes), match.end() + 50)
-                context = notes[context_start:context_end].lower()
-                
-                if 'broke' in context or 'broken' in context or 'not working' in context:
-                    status = "broken"
-                elif 'no ' + equipment.lower() in context:
-                    status = "unavailable"
-                else:
-                    status = "available"
-                
+        listed_specialties = {s.lower() for s in profile.specialties}
+        for _, _, _, specialty in specialty_hits:
+            if specialty not in listed_specialties:
                 profile.capabilities.append(MedicalCapability(
-                    capability_type="equipment",
-                    name=equipment,
-                    status=status,
-                    confidence=0.8,
-                    source_text=context,
+                    capability_type="specialty",
+                    name=specialty.title(),
+                    status="mentioned",
+                    confidence=0.7,
+                    source_text=notes,
                     facility_id=facility_id
                 ))
+        
+        # Broken markers are located once per facility; each equipment hit
+        # then only checks whether one lies inside its context window
+        broken_spans = [m.span() for m in BROKEN_MARKERS.finditer(notes_lower)] if equipment_hits else []
+        broken_starts = [span[0] for span in broken_spans]
+        
+        # Extract equipment mentioned in notes
+        for _, start, end, equipment in equipment_hits:
+            # Check status context: a slice of the lowered notes (hits come
+            # from notes_lower, so equipment is already lowercase too)
+            context_start = max(0, start - 50)
+            context_end = min(len(notes_lower), end + 50)
+            context = notes_lower[context_start:context_end]
+            
+            if _span_within(broken_spans, broken_starts, context_start, context_end):
+                status = "broken"
+            elif 'no ' + equipment in context:
+                status = "unavailable"
+            else:
+                status = "available"
+            
+            profile.capabilities.append(MedicalCapability(
+                capability_type="equipment",
+                name=equipment,
+                status=status,
+                confidence=0.8,
+                source_text=context,
+                facility_id=facility_id
+            ))
     
     def _detect_gaps(self, profile: FacilityProfile, 
-                     text: str, 
+                     text_lower: str, 
                      facility_id: str):
-        """Detect capability gaps and urgent needs"""
-        
-        text_lower = text.lower()
+        """Detect capability gaps and urgent needs (text_lower is already lowercased)"""
         
         # Detect shortages
-        shortage_indicators = [
-            (r'short on (.*?)[\.,]', 'Staff shortage: {}'),
-            (r'need more (.*?)[\.,]', 'Urgent need: {}'),
-            (r'no (.*?) available', 'Missing: {}'),
-            (r'no (.*?) on (permanent )?staff', 'No {} on staff'),
-            (r'only (\d+) (.*?) on staff', 'Limited {}: only {} available'),
-        ]
-        
-        for pattern, template in shortage_indicators:
-            matches = re.finditer(pattern, text_lower)
+        for pattern, template in SHORTAGE_INDICATORS:
+            matches = pattern.finditer(text_lower)
             for match in matches:
                 if len(match.groups()) == 1:
                     gap = template.format(match.group(1).strip())
@@ -263,83 +517,145 @@ class IntelligentDocumentParser:
                 profile.urgent_needs.append(gap)
         
         # Detect broken/unavailable critical equipment
-        critical_equipment = ['CT scanner', 'MRI', 'ICU', 'operating theater']
-        for equip in critical_equipment:
-            equip_lower = equip.lower()
+        for equip, equip_lower, no_equip_re, broken_equip_re in CRITICAL_EQUIPMENT:
             if equip_lower in text_lower:
                 # Check for negative context
-                if re.search(f'no {equip_lower}', text_lower):
+                if no_equip_re.search(text_lower):
                     profile.gaps.append(f"No {equip}")
-                elif re.search(f'{equip_lower}.*?broke', text_lower):
+                elif broken_equip_re.search(text_lower):
                     profile.gaps.append(f"{equip} broken/awaiting repair")
         
         # Detect suspicious claims (facility type vs capabilities mismatch)
-        if profile.facility_type == "District Hospital":
-            advanced_equipment = ['MRI', 'CT Scanner', 'Cardiac Catheterization']
-            for eq in advanced_equipment:
-                if any(eq.lower() in e.lower() for e in profile.equipment):
-                    profile.suspicious_claims.append(
-                        f"District hospital claims {eq} - verify accuracy"
-                    )
+        suspicious = self.suspicious_equipment.get(profile.facility_type)
+        if suspicious:
+            equipment_text = _equipment_text(profile)
+            for eq_lower, message in suspicious:
+                if eq_lower in equipment_text:
+                    profile.suspicious_claims.append(message)
     
     def _compute_scores(self, profile: FacilityProfile):
-        """Compute capability and desert risk scores"""
-        
-        # Capability score based on available resources
-        specialty_count = len(profile.specialties)
-        equipment_count = len(profile.equipment)
-        procedure_count = len(profile.procedures)
-        
-        # Weight by facility type
-        type_weights = {
-            "Teaching Hospital": 1.0,
-            "Regional Hospital": 0.7,
-            "District Hospital": 0.4,
-            "Mission Hospital": 0.5
-        }
-        base_weight = type_weights.get(profile.facility_type, 0.3)
-        
-        # Compute capability score (0-100)
-        profile.capability_score = min(100, (
-            (specialty_count * 5) + 
-            (equipment_count * 3) + 
-            (procedure_count * 2)
-        ) * base_weight)
-        
-        # Desert risk score - higher = more likely to be in medical desert
-        desert_factors = 0
-        
-        # Factor 1: Low capability score
-        if profile.capability_score < 30:
-            desert_factors += 30
-        elif profile.capability_score < 50:
-            desert_factors += 15
-        
-        # Factor 2: Number of gaps
-        desert_factors += min(30, len(profile.gaps) * 5)
-        
-        # Factor 3: Critical missing equipment
-        critical_missing = ['CT Scanner', 'MRI', 'ICU', 'Operating Theater']
-        for critical in critical_missing:
-            if not any(critical.lower() in eq.lower() for eq in profile.equipment):
-                desert_factors += 10
-        
-        profile.desert_risk_score = min(100, desert_factors)
+        """Compute capability and desert risk scores (see score_profiles)"""
+        score_profiles([profile])
 
 
-def parse_facility_dataset(csv_path: str) -> List[FacilityProfile]:
+def score_profiles(profiles: List[FacilityProfile]):
+    """
+    Compute capability and desert risk scores for many profiles at once:
+    per-profile counts are gathered in one pass, the scoring arithmetic
+    runs as NumPy array operations, and results are written back.
+    
+    Capability is the type-weighted resource count (capped at 100); desert
+    risk adds points for low capability, gaps and missing critical
+    equipment (capped at 100).
+    """
+    if not profiles:
+        return
+    
+    counts = np.array([
+        (len(p.specialties), len(p.equipment), len(p.procedures),
+         len(p.gaps), _missing_critical_count(p))
+        for p in profiles
+    ], dtype=np.int64)
+    weights = np.array([
+        FACILITY_TYPE_WEIGHTS.get(p.facility_type, DEFAULT_TYPE_WEIGHT) for p in profiles
+    ])
+    
+    # Capability score based on available resources, weighted by facility type
+    capability = np.minimum(100, (counts[:, 0] * 5 + counts[:, 1] * 3 + counts[:, 2] * 2) * weights)
+    # Desert risk score - higher = more likely to be in medical desert
+    desert = np.minimum(100, (
+        np.where(capability < 30, 30, np.where(capability < 50, 15, 0)) +
+        np.minimum(30, counts[:, 3] * 5) +
+        counts[:, 4] * 10
+    ))
+    
+    for profile, capability_score, desert_risk_score in zip(profiles, capability.tolist(), desert.tolist()):
+        profile.capability_score = capability_score
+        profile.desert_risk_score = desert_risk_score
+
+
+# Below this many facilities, worker start-up costs more than it saves
+PARALLEL_MIN_FACILITIES = 512
+
+_worker_parser: Optional['IntelligentDocumentParser'] = None
+
+
+def _init_worker():
+    """Give each pool process its own parser (patterns compile on import)"""
+    global _worker_parser
+    _worker_parser = IntelligentDocumentParser()
+
+
+def _parse_one(task: tuple) -> FacilityProfile:
+    """Pool task: (row, split_fields, notes_lower) -> unscored profile"""
+    return _worker_parser.extract_capabilities(*task, score=False)
+
+
+def _facility_tasks(df: pd.DataFrame) -> List[tuple]:
+    """
+    Column-wise preprocessing of a facility frame (instead of per-row
+    iterrows() boxing) into extract_capabilities argument tuples
+    """
+    text_columns = {
+        name: (df[name] if name in df.columns else pd.Series('', index=df.index)).astype(str)
+        for name in TEXT_FIELDS
+    }
+    split_columns = {name: _split_column(text_columns[name]) for name in STRUCTURED_FIELDS}
+    notes_lower = text_columns['staff_notes'].str.lower().tolist()
+    
+    # Low-cardinality labels go through a categorical so every row shares
+    # one str object per distinct value instead of holding its own copy
+    shared_labels = {
+        name: df[name].astype('category')
+        for name in LABEL_FIELDS if name in df.columns and df[name].dtype == object
+    }
+    rows = df.assign(**text_columns, **shared_labels).to_dict('records')
+    
+    return [
+        (row, {name: split_columns[name][i] for name in STRUCTURED_FIELDS}, notes_lower[i])
+        for i, row in enumerate(rows)
+    ]
+
+
+def parse_facility_dataset(csv_path: str,
+                           max_workers: Optional[int] = None) -> List[FacilityProfile]:
     """
     Parse entire facility dataset and extract all capabilities
+    
+    Facilities are independent, so large datasets are spread over a
+    process pool (max_workers defaults to the CPU count); max_workers=1
+    forces a sequential parse.
     """
-    df = pd.read_csv(csv_path)
-    parser = IntelligentDocumentParser()
+    return list(iter_facility_profiles(csv_path, max_workers=max_workers or os.cpu_count() or 1))
+
+
+def iter_facility_profiles(csv_path: str,
+                           chunksize: int = 4096,
+                           max_workers: int = 1) -> Iterator[FacilityProfile]:
+    """
+    Stream profiles from a dataset, reading chunksize rows at a time
     
-    profiles = []
-    for _, row in df.iterrows():
-        profile = parser.extract_capabilities(row)
-        profiles.append(profile)
+    Only one chunk of rows is held in memory. With max_workers > 1, a
+    process pool is started once a chunk is large enough to repay it
+    (PARALLEL_MIN_FACILITIES) and is reused for the remaining chunks.
+    """
+    pool = None
+    parser = IntelligentDocumentParser()
     
-    return profiles
+    try:
+        for chunk in _iter_facility_csv(csv_path, chunksize):
+            tasks = _facility_tasks(chunk)
+            if pool is None and max_workers > 1 and len(tasks) >= PARALLEL_MIN_FACILITIES:
+                pool = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker)
+            if pool:
+                profiles = list(pool.map(_parse_one, tasks, chunksize=64))
+            else:
+                profiles = [parser.extract_capabilities(*task, score=False) for task in tasks]
+            score_profiles(profiles)
+            yield from profiles
+    finally:
+        if pool:
+            pool.shutdown()
 
 
 def identify_medical_deserts(profiles: List[FacilityProfile], 
@@ -347,35 +663,32 @@ def identify_medical_deserts(profiles: List[FacilityProfile],
     """
     Identify regions at high risk of being medical deserts
     """
-    deserts = []
+    if not profiles:
+        return []
     
-    # Group by region
-    region_data = {}
-    for profile in profiles:
-        region = profile.region
-        if region not in region_data:
-            region_data[region] = []
-        region_data[region].append(profile)
+    facility_df = pd.DataFrame({
+        'region': [p.region for p in profiles],
+        'desert': [p.desert_risk_score for p in profiles],
+        'capability': [p.capability_score for p in profiles],
+        'gap_count': [len(p.gaps) for p in profiles],
+        'name': [p.facility_name for p in profiles],
+        'gaps': [p.gaps for p in profiles]
+    })
     
-    # Analyze each region
-    for region, facilities in region_data.items():
-        avg_desert_score = sum(f.desert_risk_score for f in facilities) / len(facilities)
-        avg_capability = sum(f.capability_score for f in facilities) / len(facilities)
-        
-        total_gaps = sum(len(f.gaps) for f in facilities)
-        
-        if avg_desert_score >= threshold:
-            deserts.append({
-                'region': region,
-                'desert_risk_score': avg_desert_score,
-                'avg_capability_score': avg_capability,
-                'facility_count': len(facilities),
-                'total_gaps': total_gaps,
-                'facilities': [f.facility_name for f in facilities],
-                'critical_gaps': list(set([gap for f in facilities for gap in f.gaps]))
-            })
+    # One grouped aggregation per region (first-seen order, as before)
+    regions = facility_df.groupby('region', sort=False, dropna=False).agg(
+        desert_risk_score=('desert', 'mean'),
+        avg_capability_score=('capability', 'mean'),
+        facility_count=('name', 'size'),
+        total_gaps=('gap_count', 'sum'),
+        facilities=('name', list),
+        critical_gaps=('gaps', lambda s: list(set(gap for gaps in s for gap in gaps)))
+    ).reset_index()
     
-    return sorted(deserts, key=lambda x: x['desert_risk_score'], reverse=True)
+    deserts = regions[regions['desert_risk_score'] >= threshold]
+    return deserts.sort_values(
+        'desert_risk_score', ascending=False, kind='stable'
+    ).to_dict('records')
 
 
 if __name__ == "__main__":
@@ -3,12 +3,41 @@ Extraction Agent - Intelligent Document Parsing
 Extracts structured information from free-text medical facility descriptions
 """
 
+import json
 import re
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 import anthropic
 import os
 
+# Output budget per text for LLM procedure extraction; batched requests scale
+# it by the number of texts, up to the model's per-request cap
+LLM_TOKENS_PER_TEXT = 1000
+LLM_BATCH_MAX_TOKENS = 32000
+
+# Most LLM answers kept per agent (least recently used are evicted)
+LLM_CACHE_SIZE = 4096
+
+try:
+    import ahocorasick  # optional single-pass multi-keyword matcher
+except ImportError:
+    ahocorasick = None
+
+
+def _build_automaton(keywords):
+    """Build an Aho-Corasick automaton over literal keywords (None if unavailable)"""
+    if ahocorasick is None:
+        return None
+    
+    automaton = ahocorasick.Automaton()
+    for keyword in keywords:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
 
 @dataclass
 class ExtractedCapability:
@@ -54,13 +83,50 @@ class ExtractionAgent:
             'pediatrics', 'oncology', 'nephrology', 'emergency medicine',
             'ophthalmology', 'surgery', 'internal medicine'
         }
+        
+        # One automaton per vocabulary: a single pass finds every keyword
+        self._procedure_automaton = _build_automaton(self.procedure_keywords)
+        self._equipment_automaton = _build_automaton(self.equipment_keywords)
+        self._specialty_automaton = _build_automaton(self.specialty_keywords)
+        
+        # LLM procedures keyed by source text; repeated notes reuse the answer.
+        # Batched chunks run on worker threads, so access goes through the lock
+        self._llm_cache: OrderedDict[str, List[ExtractedCapability]] = OrderedDict()
+        self._llm_cache_lock = threading.Lock()
     
-    def extract_from_facility(self, facility_data: Dict[str, Any]) -> Dict[str, Any]:
+    def clear_llm_cache(self):
+        """Forget cached LLM answers (e.g. when the dataset changes)"""
+        with self._llm_cache_lock:
+            self._llm_cache.clear()
+    
+    def _llm_cache_get(self, text: str) -> Optional[List[ExtractedCapability]]:
+        """Cached LLM procedures for text (marked recently used), else None"""
+        with self._llm_cache_lock:
+            cached = self._llm_cache.get(text)
+            if cached is not None:
+                self._llm_cache.move_to_end(text)
+            return cached
+    
+    def _llm_cache_put(self, text: str, procedures: List[ExtractedCapability]):
+        """Cache LLM procedures for text, evicting the least recently used"""
+        with self._llm_cache_lock:
+            self._llm_cache[text] = procedures
+            self._llm_cache.move_to_end(text)
+            while len(self._llm_cache) > LLM_CACHE_SIZE:
+                self._llm_cache.popitem(last=False)
+    
+    def extract_from_facility(
+        self,
+        facility_data: Dict[str, Any],
+        llm_procedures: Optional[List[ExtractedCapability]] = None
+    ) -> Dict[str, Any]:
         """
         Extract structured capabilities from a single facility record
         
         Args:
             facility_data: Dictionary containing facility information
+            llm_procedures: Pre-computed LLM procedures (from a batched call);
+                if None, the LLM is queried for this facility alone
             
         Returns:
             Dictionary with extracted capabilities and anomalies
@@ -70,7 +136,7 @@ class ExtractionAgent:
         specialties_text = facility_data.get('specialties_free_text', '')
         
         # Extract using both rule-based and LLM methods
-        procedures = self._extract_procedures(procedures_text)
+        procedures = self._extract_procedures(procedures_text, llm_procedures)
         equipment = self._extract_equipment(equipment_text)
         specialties = self._extract_specialties(specialties_text)
         
@@ -89,7 +155,49 @@ class ExtractionAgent:
             'capability_score': self._calculate_capability_score(procedures, equipment, specialties)
         }
     
-    def _extract_procedures(self, text: str) -> List[ExtractedCapability]:
+    def extract_batch(
+        self,
+        records: List[Dict[str, Any]],
+        batch_size: int = 32,
+        max_workers: int = 16
+    ) -> List[Dict[str, Any]]:
+        """
+        Extract capabilities from many facility records
+        
+        LLM procedure extraction is issued once per chunk of ``batch_size``
+        records instead of once per facility. Each chunk's request and its
+        rule-based extraction run together on one of up to ``max_workers``
+        threads, so a chunk is processed while other requests are in flight.
+        
+        Args:
+            records: List of facility dictionaries
+            batch_size: Number of facilities sent to the LLM per request
+            max_workers: Maximum number of concurrent LLM requests
+            
+        Returns:
+            List of extraction results, in the same order as ``records``
+        """
+        chunks = [records[i:i + batch_size] for i in range(0, len(records), batch_size)]
+        if not chunks:
+            return []
+        
+        def extract_chunk(chunk):
+            llm_results = self._llm_extract_procedures_batch(
+                [r.get('procedures_free_text', '') for r in chunk]
+            )
+            return [
+                self.extract_from_facility(record, llm_procedures)
+                for record, llm_procedures in zip(chunk, llm_results)
+            ]
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+            return [result for chunk_results in pool.map(extract_chunk, chunks) for result in chunk_results]
+    
+    def _extract_procedures(
+        self,
+        text: str,
+        llm_procedures: Optional[List[ExtractedCapability]] = None
+    ) -> List[ExtractedCapability]:
         """Extract medical procedures from free text"""
         if not text:
             return []
@@ -98,24 +206,26 @@ class ExtractionAgent:
         text_lower = text.lower()
         
         # Rule-based extraction for known procedures
-        for procedure in self.procedure_keywords:
-            if procedure in text_lower:
-                # Extract context around the procedure
-                details = self._extract_context(text, procedure)
-                
-                # Try to extract volume/frequency
-                volume = self._extract_volume(text, procedure)
-                
-                procedures.append(ExtractedCapability(
-                    capability_type='procedure',
-                    name=procedure.title(),
-                    details=details,
-                    quantity=volume,
-                    confidence=0.9
-                ))
+        for procedure in self._find_keywords(text_lower, self.procedure_keywords, self._procedure_automaton):
+            pos = text_lower.find(procedure)
+            
+            # Extract context around the procedure
+            details = self._extract_context(text, procedure, pos=pos)
+            
+            # Try to extract volume/frequency
+            volume = self._extract_volume(text_lower, procedure, pos)
+            
+            procedures.append(ExtractedCapability(
+                capability_type='procedure',
+                name=procedure.title(),
+                details=details,
+                quantity=volume,
+                confidence=0.9
+            ))
         
         # Use LLM for more nuanced extraction
-        llm_procedures = self._llm_extract_procedures(text)
+        if llm_procedures is None:
+            llm_procedures = self._llm_extract_procedures(text)
         procedures.extend(llm_procedures)
         
         return self._deduplicate_capabilities(procedures)
@@ -129,18 +239,19 @@ class ExtractionAgent:
         text_lower = text.lower()
         
         # Look for equipment with quantities and status
-        for equip in self.equipment_keywords:
-            if equip in text_lower:
-                quantity = self._extract_quantity(text, equip)
-                status = self._extract_status(text, equip)
-                
-                equipment.append(ExtractedCapability(
-                    capability_type='equipment',
-                    name=equip.upper() if len(equip) <= 3 else equip.title(),
-                    quantity=quantity,
-                    status=status or 'operational',
-                    confidence=0.85
-                ))
+        for equip in self._find_keywords(text_lower, self.equipment_keywords, self._equipment_automaton):
+            # Locate once; the helpers slice the lowered text around pos
+            pos = text_lower.find(equip)
+            quantity = self._extract_quantity(text_lower, equip, pos)
+            status = self._extract_status(text_lower, equip, pos)
+            
+            equipment.append(ExtractedCapability(
+                capability_type='equipment',
+                name=equip.upper() if len(equip) <= 3 else equip.title(),
+                quantity=quantity,
+                status=status or 'operational',
+                confidence=0.85
+            ))
         
         return self._deduplicate_capabilities(equipment)
     
@@ -152,28 +263,39 @@ class ExtractionAgent:
         specialties = []
         text_lower = text.lower()
         
-        for specialty in self.specialty_keywords:
-            if specialty in text_lower:
-                details = self._extract_context(text, specialty)
-                
-                specialties.append(ExtractedCapability(
-                    capability_type='specialty',
-                    name=specialty.title(),
-                    details=details,
-                    confidence=0.9
-                ))
+        for specialty in self._find_keywords(text_lower, self.specialty_keywords, self._specialty_automaton):
+            details = self._extract_context(text, specialty, pos=text_lower.find(specialty))
+            
+            specialties.append(ExtractedCapability(
+                capability_type='specialty',
+                name=specialty.title(),
+                details=details,
+                confidence=0.9
+            ))
         
         return self._deduplicate_capabilities(specialties)
     
+    def _find_keywords(self, text_lower: str, keywords, automaton) -> List[str]:
+        """Keywords present in text_lower, in vocabulary iteration order"""
+        if automaton is None:
+            return [keyword for keyword in keywords if keyword in text_lower]
+        
+        found = {keyword for _, keyword in automaton.iter(text_lower)}
+        return [keyword for keyword in keywords if keyword in found]
+    
     def _llm_extract_procedures(self, text: str) -> List[ExtractedCapability]:
         """Use Claude to extract procedures not caught by rules"""
         if not text or len(text) < 20:
             return []
         
+        cached = self._llm_cache_get(text)
+        if cached is not None:
+            return list(cached)
+        
         try:
             message = self.client.messages.create(
                 model="claude-sonnet-4-20250514",
-                max_tokens=1000,
+                max_tokens=LLM_TOKENS_PER_TEXT,
                 temperature=0,
                 messages=[{
                     "role": "user",
@@ -194,10 +316,9 @@ If no procedures found, return empty array []."""
             response_text = message.content[0].text.strip()
             
             # Parse JSON response (simplified - real implementation would be more robust)
-            import json
             try:
                 procedures_data = json.loads(response_text)
-                return [
+                procedures = [
                     ExtractedCapability(
                         capability_type='procedure',
                         name=p['name'],
@@ -209,17 +330,113 @@ If no procedures found, return empty array []."""
                 ]
             except:
                 return []
+            
+            self._llm_cache_put(text, procedures)
+            return list(procedures)
                 
         except Exception as e:
             print(f"LLM extraction error: {e}")
             return []
     
-    def _extract_context(self, text: str, keyword: str, window: int = 50) -> str:
-        """Extract context around a keyword"""
-        text_lower = text.lower()
-        keyword_lower = keyword.lower()
+    def _llm_extract_procedures_batch(self, texts: List[str]) -> List[List[ExtractedCapability]]:
+        """Use Claude to extract procedures for several facilities in one request"""
+        results: List[List[ExtractedCapability]] = [[] for _ in texts]
+        
+        # Same cut-off as the single-facility path; cached and repeated
+        # texts are answered without being sent again
+        pending: Dict[str, List[int]] = {}
+        for i, t in enumerate(texts):
+            if not t or len(t) < 20:
+                continue
+            cached = self._llm_cache_get(t)
+            if cached is not None:
+                results[i] = list(cached)
+            else:
+                pending.setdefault(t, []).append(i)
+        if not pending:
+            return results
+        
+        unique = list(pending)
+        documents = "\n\n".join(f"[{i}] {t}" for i, t in enumerate(unique))
         
-        pos = text_lower.find(keyword_lower)
+        try:
+            message = self.client.messages.create(
+                model="claude-sonnet-4-20250514",
+                max_tokens=min(LLM_TOKENS_PER_TEXT * len(unique), LLM_BATCH_MAX_TOKENS),
+                temperature=0,
+                messages=[{
+                    "role": "user",
+                    "content": f"""Extract all medical procedures from each numbered text below. For each procedure, identify:
+1. Procedure name
+2. Any volume/frequency mentioned
+3. Complexity level if indicated
+
+Texts:
+{documents}
+
+Respond in JSON format, keyed by text number:
+{{"0": [{{"name": "procedure_name", "volume": number or null, "complexity": "basic/advanced/specialized" or null}}]}}
+
+Use an empty array for texts with no procedures."""
+                }]
+            )
+            
+            response_text = message.content[0].text.strip()
+            
+            try:
+                procedures_data = json.loads(response_text)
+            except json.JSONDecodeError as e:
+                # Typically a response truncated at max_tokens
+                print(f"LLM batch response not valid JSON ({e})")
+                procedures_data = {}
+            if not isinstance(procedures_data, dict):
+                print("LLM batch response is not an object keyed by text number")
+                procedures_data = {}
+            
+            resolved = set()
+            for key, procs in procedures_data.items():
+                if not key.isdigit() or int(key) >= len(unique):
+                    continue
+                text = unique[int(key)]
+                try:
+                    procedures = [
+                        ExtractedCapability(
+                            capability_type='procedure',
+                            name=p['name'],
+                            quantity=p.get('volume'),
+                            details=p.get('complexity'),
+                            confidence=0.8
+                        )
+                        for p in procs
+                    ]
+                except (KeyError, TypeError, AttributeError, ValueError):
+                    continue
+                self._llm_cache_put(text, procedures)
+                for i in pending[text]:
+                    results[i] = list(procedures)
+                resolved.add(text)
+            
+            # Retry each text without a valid entry on its own rather
+            # than dropping it
+            missing = [text for text in unique if text not in resolved]
+            if missing:
+                print(f"LLM batch response missing or malformed for {len(missing)} "
+                      f"of {len(unique)} texts; extracting them individually")
+                for text in missing:
+                    procedures = self._llm_extract_procedures(text)
+                    for i in pending[text]:
+                        results[i] = list(procedures)
+                
+        except Exception as e:
+            print(f"LLM batch extraction error: {e}")
+        
+        return results
+    
+    def _extract_context(self, text: str, keyword: str, window: int = 50,
+                         pos: Optional[int] = None) -> str:
+        """Extract context around a keyword (pos: its already-known offset)"""
+        if pos is None:
+            pos = text.lower().find(keyword.lower())
         if pos == -1:
             return ""
         
@@ -228,43 +445,43 @@ If no procedures found, return empty array []."""
         
         return text[start:end].strip()
     
-    def _extract_volume(self, text: str, procedure: str) -> Optional[int]:
-        """Extract procedure volume from text"""
+    def _extract_volume(self, text_lower: str, procedure: str, pos: int) -> Optional[int]:
+        """Extract procedure volume from lowercased text, procedure found at pos"""
         # Look for patterns like "200 cardiac surgeries", "approximately 150 major surgeries"
-        context = self._extract_context(text, procedure, 100)
+        context = self._extract_context(text_lower, procedure, 100, pos)
         
         # Pattern: number + procedure
         volume_pattern = r'(\d+)\s*(?:major\s+)?(?:surgeries|procedures|operations)'
-        match = re.search(volume_pattern, context.lower())
+        match = re.search(volume_pattern, context)
         
         if match:
             return int(match.group(1))
         
         return None
     
-    def _extract_quantity(self, text: str, equipment: str) -> Optional[int]:
-        """Extract equipment quantity from text"""
-        context = self._extract_context(text, equipment, 30)
+    def _extract_quantity(self, text_lower: str, equipment: str, pos: int) -> Optional[int]:
+        """Extract equipment quantity from lowercased text, equipment found at pos"""
+        context = self._extract_context(text_lower, equipment, 30, pos)
         
         # Pattern: number + equipment or equipment (number)
         qty_pattern = r'(\d+)\s*(?:tesla\s+)?' + re.escape(equipment)
-        match = re.search(qty_pattern, context.lower())
+        match = re.search(qty_pattern, context)
         
         if match:
             return int(match.group(1))
         
         # Alternative pattern: equipment (number units)
         alt_pattern = re.escape(equipment) + r'\s*\((\d+)\s*(?:units?|machines?)?\)'
-        match = re.search(alt_pattern, context.lower())
+        match = re.search(alt_pattern, context)
         
         if match:
             return int(match.group(1))
         
         return None
     
-    def _extract_status(self, text: str, equipment: str) -> Optional[str]:
-        """Extract equipment operational status"""
-        context = self._extract_context(text, equipment, 60).lower()
+    def _extract_status(self, text_lower: str, equipment: str, pos: int) -> Optional[str]:
+        """Extract equipment operational status from lowercased text, equipment found at pos"""
+        context = self._extract_context(text_lower, equipment, 60, pos)
         
         if any(word in context for word in ['broken', 'not working', 'non-functional', 'out of order']):
             return 'broken'
@@ -290,7 +507,8 @@ If no procedures found, return empty array []."""
         
         if 'cardiac surgery' in procedure_names:
             required = ['ct scanner', 'icu']
-            missing = [r for r in required if not any(r in e for e in equipment_names)]
+            equipment_text = '\n'.join(equipment_names)
+            missing = [r for r in required if r not in equipment_text]
             if missing:
                 anomalies.append(f"Claims cardiac surgery but missing: {', '.join(missing)}")
         
@@ -5,12 +5,10 @@ Runs the complete pipeline: parsing → reasoning → visualization
 
 import sys
 import os
+import subprocess
 from datetime import datetime
-from document_parser import parse_facility_dataset, identify_medical_deserts
-from agentic_planner import HealthcareAgent
-from visualization import create_medical_desert_map, generate_regional_report, create_summary_statistics
-from mlflow_tracking import track_agent_execution, create_experiment_dashboard
-import json
+from heapq import nlargest
+import orjson
 
 
 def print_banner():
@@ -30,6 +28,12 @@ def run_complete_analysis(data_path: str = 'ghana_facilities.csv',
         data_path: Path to facility CSV data
         interactive: If True, prompts for user queries
     """
+    # Heavy pipeline modules (pandas, folium, mlflow, LLM clients) are only
+    # imported here, so `help` and `web` start without them
+    from document_parser import parse_facility_dataset, identify_medical_deserts
+    from agentic_planner import HealthcareAgent
+    from visualization import create_medical_desert_map, generate_regional_report, create_summary_statistics, profile_frame
+    from mlflow_tracking import track_agent_execution
     
     print_banner()
     
@@ -115,19 +119,21 @@ def run_complete_analysis(data_path: str = 'ghana_facilities.csv',
     print(f"\n\n🗺️  STEP 4: Creating Visualizations")
     print("-" * 70)
     
-    # Create map
-    map_path = create_medical_desert_map(profiles, 'medical_desert_map.html')
+    # Map, report and statistics all read the same per-facility columns:
+    # build them once and render in-process
+    frame = profile_frame(profiles)
+    
+    map_path = create_medical_desert_map(profiles, 'medical_desert_map.html', full_path, frame)
     print(f"✅ Interactive map created: {map_path}")
     
-    # Create report
-    report_path = generate_regional_report(profiles, 'regional_report.html')
+    report_path = generate_regional_report(profiles, 'regional_report.html', full_path, frame)
     print(f"✅ Regional report created: {report_path}")
     
     # Step 5: Generate Summary Statistics
     print(f"\n\n📈 STEP 5: Summary Statistics")
     print("-" * 70)
     
-    stats = create_summary_statistics(profiles)
+    stats = create_summary_statistics(profiles, frame)
     
     print(f"\n🏥 Total Facilities: {stats['total_facilities']}")
     print(f"\n📊 Risk Distribution:")
@@ -137,12 +143,12 @@ def run_complete_analysis(data_path: str = 'ghana_facilities.csv',
     print(f"   - Low (<40):       {stats['risk_distribution']['low']} facilities")
     
     print(f"\n🌍 Regional Overview:")
-    sorted_regions = sorted(
+    top_regions = nlargest(
+        5,
         stats['regional_stats'].items(),
-        key=lambda x: x[1]['avg_desert_risk'],
-        reverse=True
+        key=lambda x: x[1]['avg_desert_risk']
     )
-    for region, data in sorted_regions[:5]:
+    for region, data in top_regions:
         print(f"   {region:20} → Risk: {data['avg_desert_risk']:5.1f} | Facilities: {data['count']} | Gaps: {data['total_gaps']}")
     
     print(f"\n🔧 Top 5 Critical Gaps:")
@@ -164,8 +170,11 @@ def run_complete_analysis(data_path: str = 'ghana_facilities.csv',
     }
     
     export_path = f"analysis_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    with open(export_path, 'w') as f:
-        json.dump(export_data, f, indent=2)
+    with open(export_path, 'wb') as f:
+        f.write(orjson.dumps(
+            export_data,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        ))
     
     print(f"✅ Analysis results exported: {export_path}")
     
@@ -194,7 +203,8 @@ def run_web_interface():
     print("If it doesn't open automatically, navigate to: http://localhost:8501")
     print("\nPress Ctrl+C to stop the server.\n")
     
-    os.system("streamlit run app.py")
+    # Run streamlit directly (no intermediate shell) so Ctrl+C reaches it
+    subprocess.run(["streamlit", "run", "app.py"], check=False)
 
 
 def show_help():
@@ -229,6 +239,7 @@ if __name__ == "__main__":
         run_web_interface()
     
     elif command == "experiments":
+        from mlflow_tracking import create_experiment_dashboard
         print_banner()
         create_experiment_dashboard()
     
@@ -4,11 +4,97 @@ Map Generator - Interactive visualization of medical facilities and deserts
 
 import folium
 from folium import plugins
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Any, Optional
+from collections import defaultdict
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
 import json
 
 
+@lru_cache(maxsize=8192)
+def _facility_popup_html(
+    name: str,
+    ftype: str,
+    region: str,
+    category: str,
+    score: float,
+    procedure_names: Tuple[str, ...],
+    procedure_count: int,
+    equipment: Tuple[tuple, ...],
+    equipment_count: int,
+    anomalies: Tuple[str, ...]
+) -> str:
+    """Facility popup HTML; repeated map builds reuse identical popups"""
+    html = f"""
+        <div style="font-family: Arial, sans-serif; min-width: 250px;">
+            <h4 style="margin: 0 0 10px 0; color: #2c3e50;">{name}</h4>
+            <p style="margin: 5px 0;"><strong>Type:</strong> {ftype}</p>
+            <p style="margin: 5px 0;"><strong>Region:</strong> {region}</p>
+            <p style="margin: 5px 0;"><strong>Capability:</strong> {category} ({score:.0f}/100)</p>
+        """
+    
+    # Add procedures
+    if procedure_count:
+        html += "<p style='margin: 10px 0 5px 0;'><strong>Key Procedures:</strong></p><ul style='margin: 0; padding-left: 20px;'>"
+        for proc_name in procedure_names:
+            html += f"<li>{proc_name}</li>"
+        if procedure_count > 3:
+            html += f"<li><em>...and {procedure_count - 3} more</em></li>"
+        html += "</ul>"
+    
+    # Add operational equipment
+    if equipment_count:
+        html += "<p style='margin: 10px 0 5px 0;'><strong>Equipment:</strong></p><ul style='margin: 0; padding-left: 20px;'>"
+        for equip_name, quantity in equipment:
+            html += f"<li>{equip_name}"
+            if quantity:
+                html += f" (×{quantity})"
+            html += "</li>"
+        if equipment_count > 3:
+            html += f"<li><em>...and {equipment_count - 3} more</em></li>"
+        html += "</ul>"
+    
+    # Add anomalies
+    if anomalies:
+        html += "<p style='margin: 10px 0 5px 0; color: #e74c3c;'><strong>⚠️ Issues:</strong></p><ul style='margin: 0; padding-left: 20px;'>"
+        for anomaly in anomalies:
+            html += f"<li style='color: #e74c3c;'>{anomaly}</li>"
+        html += "</ul>"
+    
+    html += "</div>"
+    
+    return html
+
+
+@lru_cache(maxsize=1024)
+def _desert_popup_html(
+    region: str,
+    severity: str,
+    missing: Tuple[str, ...],
+    missing_count: int
+) -> str:
+    """Medical desert popup HTML"""
+    html = f"""
+        <div style="font-family: Arial, sans-serif; min-width: 200px;">
+            <h4 style="margin: 0 0 10px 0; color: #c0392b;">Medical Desert: {region}</h4>
+            <p style="margin: 5px 0;"><strong>Severity:</strong> {severity.upper()}</p>
+            <p style="margin: 5px 0;"><strong>Missing Capabilities:</strong> {missing_count}</p>
+        """
+    
+    if missing:
+        html += "<ul style='margin: 5px 0; padding-left: 20px;'>"
+        for cap in missing:
+            html += f"<li>{cap}</li>"
+        if missing_count > 5:
+            html += f"<li><em>...and {missing_count - 5} more</em></li>"
+        html += "</ul>"
+    
+    html += "</div>"
+    
+    return html
+
+
 class MapGenerator:
     """Generates interactive maps showing facility locations and capability levels"""
     
@@ -24,6 +110,24 @@ class MapGenerator:
         'critical': '#c0392b'    # Dark red
     }
     
+    # Desert region label, filled per desert with str.format
+    DESERT_LABEL_TEMPLATE = (
+        '<div style="background-color: {color}; color: white; padding: 5px 10px; '
+        'border-radius: 3px; font-weight: bold; font-size: 12px; white-space: nowrap;">'
+        '{region} - {severity}</div>'
+    )
+    
+    # Capability score classes: np.searchsorted(SCORE_BINS, score, side='right') indexes
+    # CATEGORY_TABLE rows of (hex color, folium marker color, label)
+    SCORE_BINS = np.array([20, 40, 60, 80])
+    CATEGORY_TABLE = [
+        (COLORS['critical'], 'darkred', 'Critical'),
+        (COLORS['poor'], 'red', 'Limited'),
+        (COLORS['moderate'], 'orange', 'Moderate'),
+        (COLORS['good'], 'blue', 'Good'),
+        (COLORS['excellent'], 'green', 'Excellent')
+    ]
+    
     def __init__(self):
         pass
     
@@ -48,22 +152,14 @@ class MapGenerator:
             center = self.GHANA_CENTER
         
         # Create base map
-        m = folium.Map(
-            location=center,
-            zoom_start=zoom_start,
-            tiles='OpenStreetMap'
-        )
+        m = self._new_base_map(center, zoom_start)
         
         # Add facility markers
-        for facility in facilities:
-            self._add_facility_marker(m, facility)
+        self._add_facility_markers(m, facilities)
         
         # Add layer control
         folium.LayerControl().add_to(m)
         
-        # Add fullscreen button
-        plugins.Fullscreen().add_to(m)
-        
         return m
     
     def create_desert_map(
@@ -86,27 +182,31 @@ class MapGenerator:
         if center is None:
             center = self.GHANA_CENTER
         
-        m = folium.Map(
-            location=center,
-            zoom_start=7,
-            tiles='OpenStreetMap'
-        )
+        m = self._new_base_map(center)
         
-        # Group facilities by region
-        facilities_by_region = {}
+        # Average position for each region, accumulated in one pass:
+        # region -> [lat sum, lat count, lon sum, lon count]. The same pass
+        # collects the marker columns for the facility layer below.
+        sums = defaultdict(lambda: [0.0, 0, 0.0, 0])
+        lats, lons, scores = [], [], []
         for facility in facilities:
-            region = facility.get('region', 'Unknown')
-            if region not in facilities_by_region:
-                facilities_by_region[region] = []
-            facilities_by_region[region].append(facility)
-        
-        # Calculate average position for each region
-        region_centers = {}
-        for region, facs in facilities_by_region.items():
-            lats = [f['latitude'] for f in facs if f.get('latitude')]
-            lons = [f['longitude'] for f in facs if f.get('longitude')]
-            if lats and lons:
-                region_centers[region] = (sum(lats)/len(lats), sum(lons)/len(lons))
+            s = sums[facility.get('region', 'Unknown')]
+            lat = facility.get('latitude')
+            if lat:
+                s[0] += lat
+                s[1] += 1
+            lon = facility.get('longitude')
+            if lon:
+                s[2] += lon
+                s[3] += 1
+            lats.append(lat or np.nan)
+            lons.append(lon or np.nan)
+            scores.append(facility.get('capability_score', 0))
+        
+        region_centers = {
+            region: (s[0] / s[1], s[2] / s[3])
+            for region, s in sums.items() if s[1] and s[3]
+        }
         
         # Add desert regions as circles
         for desert in medical_deserts:
@@ -141,26 +241,13 @@ class MapGenerator:
                 # Add label
                 folium.Marker(
                     location=center_coords,
-                    icon=folium.DivIcon(html=f'''
-                        <div style="
-                            background-color: {color};
-                            color: white;
-                            padding: 5px 10px;
-                            border-radius: 3px;
-                            font-weight: bold;
-                            font-size: 12px;
-                            white-space: nowrap;
-                        ">
-                            {desert.region} - {desert.severity.upper()}
-                        </div>
-                    ''')
+                    icon=folium.DivIcon(html=self.DESERT_LABEL_TEMPLATE.format(
+                        color=color, region=desert.region, severity=desert.severity.upper()
+                    ))
                 ).add_to(m)
         
         # Add facilities
-        for facility in facilities:
-            self._add_facility_marker(m, facility, small=True)
-        
-        plugins.Fullscreen().add_to(m)
+        self._add_facility_markers(m, facilities, small=True, columns=(lats, lons, scores))
         
         return m
     
@@ -179,93 +266,114 @@ class MapGenerator:
         Returns:
             Folium map with heatmap
         """
-        m = folium.Map(
-            location=self.GHANA_CENTER,
-            zoom_start=7,
-            tiles='OpenStreetMap'
-        )
+        m = self._new_base_map(self.GHANA_CENTER)
         
-        # Find facilities with the capability
-        heat_data = []
-        
-        for facility in facilities:
-            has_capability = False
-            
-            # Check procedures
+        # Flatten procedures and equipment into one column, then match the
+        # capability name against all of them in a single vectorized pass
+        owners, names, usable = [], [], []
+        for i, facility in enumerate(facilities):
             for proc in facility.get('procedures', []):
-                if capability_name.lower() in proc.name.lower():
-                    has_capability = True
-                    break
-            
-            # Check equipment
-            if not has_capability:
-                for equip in facility.get('equipment', []):
-                    if capability_name.lower() in equip.name.lower():
-                        if equip.status == 'operational':
-                            has_capability = True
-                            break
-            
-            if has_capability:
-                lat = facility.get('latitude')
-                lon = facility.get('longitude')
-                if lat and lon:
-                    # Weight by capability score
-                    weight = facility.get('capability_score', 50) / 100
-                    heat_data.append([lat, lon, weight])
+                owners.append(i)
+                names.append(proc.name)
+                usable.append(True)
+            for equip in facility.get('equipment', []):
+                owners.append(i)
+                names.append(equip.name)
+                usable.append(equip.status == 'operational')
+        
+        items = pd.DataFrame({
+            'facility': pd.Series(owners, dtype=np.int64),
+            'name': pd.Series(names, dtype=object),
+            'usable': pd.Series(usable, dtype=bool)
+        })
+        hits = items['name'].str.lower().str.contains(capability_name.lower(), regex=False) & items['usable']
+        
+        # [lat, lon, weight] rows for matched facilities with coordinates,
+        # weighted by capability score, stacked in one NumPy call
+        matched = [facilities[i] for i in np.unique(items.loc[hits, 'facility'].to_numpy()).tolist()]
+        lats = np.array([f.get('latitude') or np.nan for f in matched], dtype=float)
+        lons = np.array([f.get('longitude') or np.nan for f in matched], dtype=float)
+        weights = np.array([f.get('capability_score', 50) for f in matched], dtype=float) / 100
+        located = ~(np.isnan(lats) | np.isnan(lons))
+        heat_data = np.column_stack([lats[located], lons[located], weights[located]]).tolist()
         
         # Add heatmap layer
         if heat_data:
             plugins.HeatMap(heat_data, radius=30, blur=40).add_to(m)
         
         # Add facility markers
-        for facility in facilities:
-            self._add_facility_marker(m, facility, small=True)
+        self._add_facility_markers(m, facilities, small=True)
         
+        return m
+    
+    def _new_base_map(self, center: List[float], zoom_start: int = 7) -> folium.Map:
+        """Fresh OpenStreetMap base map with the fullscreen button attached"""
+        m = folium.Map(
+            location=center,
+            zoom_start=zoom_start,
+            tiles='OpenStreetMap'
+        )
         plugins.Fullscreen().add_to(m)
-        
         return m
     
-    def _add_facility_marker(
+    def _add_facility_markers(
         self,
         map_obj: folium.Map,
-        facility: Dict[str, Any],
-        small: bool = False
+        facilities: List[Dict[str, Any]],
+        small: bool = False,
+        columns: Optional[tuple] = None
     ):
-        """Add a facility marker to the map"""
-        lat = facility.get('latitude')
-        lon = facility.get('longitude')
+        """
+        Add markers for all facilities with usable coordinates
         
-        if not lat or not lon:
+        columns: (latitudes, longitudes, scores) already gathered by the
+        caller, with missing coordinates as NaN
+        """
+        if not facilities:
             return
         
-        # Determine color based on capability score
-        score = facility.get('capability_score', 0)
+        # Pull marker fields into NumPy columns once, then index primitives
+        if columns is None:
+            columns = (
+                [f.get('latitude') or np.nan for f in facilities],
+                [f.get('longitude') or np.nan for f in facilities],
+                [f.get('capability_score', 0) for f in facilities]
+            )
+        lats, lons, scores = (np.array(column, dtype=float) for column in columns)
         
-        if score >= 80:
-            color = self.COLORS['excellent']
-            category = 'Excellent'
-        elif score >= 60:
-            color = self.COLORS['good']
-            category = 'Good'
-        elif score >= 40:
-            color = self.COLORS['moderate']
-            category = 'Moderate'
-        elif score >= 20:
-            color = self.COLORS['poor']
-            category = 'Limited'
-        else:
-            color = self.COLORS['critical']
-            category = 'Critical'
+        # Classify every score at once; only valid coordinates get markers
+        valid = np.flatnonzero(~(np.isnan(lats) | np.isnan(lons)))
+        categories = self.SCORE_BINS.searchsorted(scores[valid], side='right')
+        
+        for i, category in zip(valid.tolist(), categories.tolist()):
+            self._add_facility_marker(
+                map_obj, facilities[i], lats[i].item(), lons[i].item(),
+                scores[i].item(), self.CATEGORY_TABLE[category], small
+            )
+    
+    def _add_facility_marker(
+        self,
+        map_obj: folium.Map,
+        facility: Dict[str, Any],
+        lat: float,
+        lon: float,
+        score: float,
+        category_row: tuple,
+        small: bool = False
+    ):
+        """Add a facility marker to the map (category_row: its CATEGORY_TABLE row)"""
+        _, marker_color, category = category_row
+        name = facility.get('facility_name')
         
         # Create popup
-        popup_html = self._create_facility_popup(facility, category)
+        popup_html = self._create_facility_popup(facility, category, name, score)
         
         # Create icon
         if small:
             icon = folium.Icon(color='blue', icon='hospital-o', prefix='fa')
         else:
             icon = folium.Icon(
-                color=self._folium_color_from_hex(color),
+                color=marker_color,
                 icon='hospital-o',
                 prefix='fa'
             )
@@ -274,94 +382,65 @@ class MapGenerator:
         folium.Marker(
             location=[lat, lon],
             popup=folium.Popup(popup_html, max_width=300),
-            tooltip=facility.get('facility_name'),
+            tooltip=name,
             icon=icon
         ).add_to(map_obj)
     
-    def _create_facility_popup(self, facility: Dict[str, Any], category: str) -> str:
-        """Create HTML popup for facility"""
-        name = facility.get('facility_name', 'Unknown')
-        ftype = facility.get('facility_type', 'Unknown')
-        region = facility.get('region', 'Unknown')
-        score = facility.get('capability_score', 0)
-        
-        html = f"""
-        <div style="font-family: Arial, sans-serif; min-width: 250px;">
-            <h4 style="margin: 0 0 10px 0; color: #2c3e50;">{name}</h4>
-            <p style="margin: 5px 0;"><strong>Type:</strong> {ftype}</p>
-            <p style="margin: 5px 0;"><strong>Region:</strong> {region}</p>
-            <p style="margin: 5px 0;"><strong>Capability:</strong> {category} ({score:.0f}/100)</p>
+    def _create_facility_popup(
+        self,
+        facility: Dict[str, Any],
+        category: str,
+        name: Optional[str] = None,
+        score: Optional[float] = None
+    ) -> str:
         """
+        Create HTML popup for facility (cached on the fields it displays)
         
-        # Add procedures
+        name/score may be passed in when the caller has already read them
+        """
+        if name is None:
+            name = facility.get('facility_name', 'Unknown')
+        if score is None:
+            score = facility.get('capability_score', 0)
         procedures = facility.get('procedures', [])
-        if procedures:
-            html += "<p style='margin: 10px 0 5px 0;'><strong>Key Procedures:</strong></p><ul style='margin: 0; padding-left: 20px;'>"
-            for proc in procedures[:3]:
-                html += f"<li>{proc.name}</li>"
-            if len(procedures) > 3:
-                html += f"<li><em>...and {len(procedures) - 3} more</em></li>"
-            html += "</ul>"
-        
-        # Add equipment
-        equipment = facility.get('equipment', [])
-        operational = [e for e in equipment if e.status == 'operational']
-        if operational:
-            html += "<p style='margin: 10px 0 5px 0;'><strong>Equipment:</strong></p><ul style='margin: 0; padding-left: 20px;'>"
-            for equip in operational[:3]:
-                html += f"<li>{equip.name}"
-                if equip.quantity:
-                    html += f" (×{equip.quantity})"
-                html += "</li>"
-            if len(operational) > 3:
-                html += f"<li><em>...and {len(operational) - 3} more</em></li>"
-            html += "</ul>"
-        
-        # Add anomalies
         anomalies = facility.get('anomalies', [])
-        if anomalies:
-            html += "<p style='margin: 10px 0 5px 0; color: #e74c3c;'><strong>⚠️ Issues:</strong></p><ul style='margin: 0; padding-left: 20px;'>"
-            for anomaly in anomalies[:2]:
-                html += f"<li style='color: #e74c3c;'>{anomaly}</li>"
-            html += "</ul>"
         
-        html += "</div>"
-        
-        return html
+        # One pass: count operational equipment, keep only the first three
+        operational_count = 0
+        operational = []
+        for equip in facility.get('equipment', []):
+            if equip.status == 'operational':
+                operational_count += 1
+                if operational_count <= 3:
+                    operational.append((equip.name, equip.quantity))
+        
+        return _facility_popup_html(
+            name,
+            facility.get('facility_type', 'Unknown'),
+            facility.get('region', 'Unknown'),
+            category,
+            score,
+            tuple(proc.name for proc in procedures[:3]),
+            len(procedures),
+            tuple(operational),
+            operational_count,
+            tuple(anomalies[:2])
+        )
     
     def _create_desert_popup(self, desert: Any) -> str:
-        """Create HTML popup for medical desert"""
-        html = f"""
-        <div style="font-family: Arial, sans-serif; min-width: 200px;">
-            <h4 style="margin: 0 0 10px 0; color: #c0392b;">Medical Desert: {desert.region}</h4>
-            <p style="margin: 5px 0;"><strong>Severity:</strong> {desert.severity.upper()}</p>
-            <p style="margin: 5px 0;"><strong>Missing Capabilities:</strong> {len(desert.missing_capabilities)}</p>
-        """
-        
-        if desert.missing_capabilities:
-            html += "<ul style='margin: 5px 0; padding-left: 20px;'>"
-            for cap in desert.missing_capabilities[:5]:
-                html += f"<li>{cap}</li>"
-            if len(desert.missing_capabilities) > 5:
-                html += f"<li><em>...and {len(desert.missing_capabilities) - 5} more</em></li>"
-            html += "</ul>"
-        
-        html += "</div>"
-        
-        return html
-    
-    def _folium_color_from_hex(self, hex_color: str) -> str:
-        """Convert hex color to folium color name (approximation)"""
-        color_map = {
-            '#2ecc71': 'green',
-            '#3498db': 'blue',
-            '#f39c12': 'orange',
-            '#e74c3c': 'red',
-            '#c0392b': 'darkred'
-        }
-        return color_map.get(hex_color, 'blue')
+        """Create HTML popup for medical desert (cached on the fields it displays)"""
+        return _desert_popup_html(
+            desert.region,
+            desert.severity,
+            tuple(desert.missing_capabilities[:5]),
+            len(desert.missing_capabilities)
+        )
     
     def save_map(self, map_obj: folium.Map, filepath: str):
         """Save map to HTML file"""
         map_obj.save(filepath)
         return filepath
+    
+    def render_to_string(self, map_obj: folium.Map) -> str:
+        """Render map to an HTML string without touching disk"""
+        return map_obj.get_root().render()
@@ -1,14 +1,89 @@
 """
 MLflow Experiment Tracking for Healthcare Agent
 Tracks model performance, citations, and agent decisions
+
+mlflow is imported where it is used, so importing this module stays cheap
+for code paths that never log a run.
 """
 
-import mlflow
-import mlflow.pyfunc
+from __future__ import annotations
+
 from datetime import datetime
-import json
-from typing import Dict, Any, List
-import pandas as pd
+import atexit
+from collections import Counter
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+import tempfile
+import time
+from typing import TYPE_CHECKING, Dict, Any, List
+import orjson
+
+if TYPE_CHECKING:
+    from mlflow.tracking import MlflowClient
+
+# MLflow's log_batch limits per request
+MAX_PARAMS_PER_BATCH = 100
+MAX_TAGS_PER_BATCH = 100
+MAX_METRICS_PER_BATCH = 1000
+MAX_ENTITIES_PER_BATCH = 1000  # params + metrics + tags combined
+
+# Run metrics summarised by create_experiment_dashboard
+DASHBOARD_METRICS = (
+    'metrics.execution_time_seconds',
+    'metrics.citation_coverage',
+    'metrics.reasoning_depth',
+    'metrics.recommendation_count',
+    'metrics.total_citations',
+)
+
+# Artifact JSON: numpy scalars and non-string keys can appear in agent output.
+# Written compact; set MLFLOW_PRETTY=1 for indented, human-readable artifacts.
+_JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+if os.environ.get("MLFLOW_PRETTY") == "1":
+    _JSON_OPTIONS |= orjson.OPT_INDENT_2
+
+
+# Artifacts are serialized on the caller's thread and uploaded on background
+# threads; pending uploads are drained at interpreter exit so no artifacts are lost
+_artifact_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="mlflow-artifacts")
+_pending_uploads: List[Future] = []
+
+
+def _upload_artifacts(client: MlflowClient, run_id: str, artifacts: List[tuple]):
+    """
+    Write (artifact dir, file name, JSON bytes) files to one staging directory and upload it.
+    mlflow.log_dict would stage its own temporary file and upload each artifact separately.
+    """
+    with tempfile.TemporaryDirectory() as staging:
+        for artifact_path, file_name, data in artifacts:
+            os.makedirs(os.path.join(staging, artifact_path), exist_ok=True)
+            with open(os.path.join(staging, artifact_path, file_name), 'wb') as f:
+                f.write(data)
+        
+        client.log_artifacts(run_id, staging)
+
+
+def _report_upload_failure(future: Future):
+    """Log a failed background upload as soon as it happens"""
+    if future.exception() is not None:
+        print(f"MLflow artifact upload failed: {future.exception()}")
+
+
+def wait_for_artifact_uploads():
+    """
+    Block until every queued artifact upload has finished, then re-raise
+    the first failure (uploads that failed earlier are kept until here)
+    """
+    errors = []
+    while _pending_uploads:
+        error = _pending_uploads.pop(0).exception()
+        if error is not None:
+            errors.append(error)
+    if errors:
+        raise errors[0]
+
+
+atexit.register(wait_for_artifact_uploads)
 
 
 class HealthcareAgentTracker:
@@ -18,11 +93,82 @@ class HealthcareAgentTracker:
     """
     
     def __init__(self, experiment_name: str = "medical_desert_agent"):
+        import mlflow
+        from mlflow.tracking import MlflowClient
+        
         mlflow.set_experiment(experiment_name)
+        self.client = MlflowClient()
         self.current_run_id = None
+        
+        # Params (key, value), metrics (key, value, timestamp ms) and tags (key, value)
+        # are buffered and sent in one log_batch on flush()
+        self._params: List[tuple] = []
+        self._metrics: List[tuple] = []
+        self._tags: List[tuple] = []
+        
+        # JSON artifacts: (artifact dir, file name, data), uploaded together on end_run
+        self._artifacts: List[tuple] = []
+    
+    def _log_param(self, key: str, value: Any):
+        self._params.append((key, str(value)))
+    
+    def _log_metric(self, key: str, value: float):
+        self._metrics.append((key, float(value), int(time.time() * 1000)))
+    
+    def set_tag(self, key: str, value: Any):
+        """Buffer a run tag (sent with the next flush)"""
+        self._tags.append((key, str(value)))
+    
+    def _add_artifact(self, artifact_path: str, file_name: str, data: Any):
+        """Buffer a JSON artifact (serialized and uploaded with the others by flush_artifacts)"""
+        self._artifacts.append((artifact_path, file_name, data))
+    
+    def flush_artifacts(self):
+        """
+        Serialize buffered JSON artifacts and hand the bytes to the background
+        uploader. Serializing here snapshots the data before the caller can
+        change it; the upload runs off the caller's path unless MLFLOW_SYNC=1.
+        """
+        if not self._artifacts:
+            return
+        
+        artifacts = [
+            (artifact_path, file_name, orjson.dumps(data, option=_JSON_OPTIONS))
+            for artifact_path, file_name, data in self._artifacts
+        ]
+        self._artifacts = []
+        future = _artifact_executor.submit(_upload_artifacts, self.client, self.current_run_id, artifacts)
+        future.add_done_callback(_report_upload_failure)
+        
+        # Drop finished uploads, but keep failures for wait_for_artifact_uploads
+        _pending_uploads[:] = [f for f in _pending_uploads if not f.done() or f.exception() is not None]
+        _pending_uploads.append(future)
+        if os.environ.get("MLFLOW_SYNC") == "1":
+            future.result()
+    
+    def flush(self):
+        """Send buffered params, metrics and tags with as few log_batch calls as possible"""
+        from mlflow.entities import Metric, Param, RunTag
+        
+        while self._params or self._metrics or self._tags:
+            params = self._params[:MAX_PARAMS_PER_BATCH]
+            tags = self._tags[:MAX_TAGS_PER_BATCH]
+            metrics = self._metrics[:min(MAX_METRICS_PER_BATCH,
+                                         MAX_ENTITIES_PER_BATCH - len(params) - len(tags))]
+            self.client.log_batch(
+                self.current_run_id,
+                metrics=[Metric(key, value, timestamp, 0) for key, value, timestamp in metrics],
+                params=[Param(key, value) for key, value in params],
+                tags=[RunTag(key, value) for key, value in tags]
+            )
+            del self._params[:len(params)]
+            del self._metrics[:len(metrics)]
+            del self._tags[:len(tags)]
     
     def start_run(self, run_name: str = None):
         """Start a new MLflow run"""
+        import mlflow
+        
         if run_name is None:
             run_name = f"query_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
@@ -30,84 +176,77 @@ class HealthcareAgentTracker:
         self.current_run_id = mlflow.active_run().info.run_id
         return self.current_run_id
     
-    def log_query(self, query: str, query_type: str):
-        """Log the input query"""
-        mlflow.log_param("query", query)
-        mlflow.log_param("query_type", query_type)
-        mlflow.log_param("timestamp", datetime.now().isoformat())
+    def log_query(self, query: str, query_type: str, timestamp: datetime = None):
+        """Log the input query (timestamp defaults to now)"""
+        self._log_param("query", query)
+        self._log_param("query_type", query_type)
+        self._log_param("timestamp", (timestamp or datetime.now()).isoformat())
     
     def log_data_sources(self, facility_count: int, regions: List[str]):
         """Log data sources used in analysis"""
-        mlflow.log_param("facility_count", facility_count)
-        mlflow.log_param("regions_analyzed", len(regions))
-        mlflow.log_param("region_list", ",".join(regions[:10]))
+        self._log_param("facility_count", facility_count)
+        self._log_param("regions_analyzed", len(regions))
+        self._log_param("region_list", ",".join(regions[:10]))
     
     def log_reasoning_steps(self, reasoning_steps: List[Dict[str, Any]]):
         """Log each reasoning step with citations"""
-        mlflow.log_param("total_reasoning_steps", len(reasoning_steps))
+        self._log_param("total_reasoning_steps", len(reasoning_steps))
         
         # Create a detailed log file
-        steps_log = []
-        for step in reasoning_steps:
-            steps_log.append({
+        steps_log = [
+            {
                 'step_number': step['step'],
                 'action': step['action'],
                 'thought': step['thought'],
                 'data_sources': step['data_used'],
                 'citations': step['citations']
-            })
+            }
+            for step in reasoning_steps
+        ]
         
         # Save as artifact
-        steps_file = f"/tmp/reasoning_steps_{self.current_run_id}.json"
-        with open(steps_file, 'w') as f:
-            json.dump(steps_log, f, indent=2)
-        
-        mlflow.log_artifact(steps_file, "reasoning_steps")
+        self._add_artifact("reasoning_steps", f"reasoning_steps_{self.current_run_id}.json", steps_log)
     
     def log_citations(self, citations: List[Dict[str, Any]]):
         """Log all citations used to support conclusions"""
         total_citations = sum(len(c.get('sources', [])) for c in citations)
-        mlflow.log_metric("total_citations", total_citations)
+        self._log_metric("total_citations", total_citations)
         
         # Create citation report
-        citation_file = f"/tmp/citations_{self.current_run_id}.json"
-        with open(citation_file, 'w') as f:
-            json.dump(citations, f, indent=2)
-        
-        mlflow.log_artifact(citation_file, "citations")
+        self._add_artifact("citations", f"citations_{self.current_run_id}.json", citations)
     
     def log_recommendations(self, recommendations: List[Dict[str, Any]]):
         """Log generated recommendations"""
-        mlflow.log_metric("recommendation_count", len(recommendations))
+        self._log_metric("recommendation_count", len(recommendations))
         
-        high_priority = sum(1 for r in recommendations if r.get('priority') == 'HIGH')
-        mlflow.log_metric("high_priority_recommendations", high_priority)
+        priorities = Counter(r.get('priority') for r in recommendations)
+        self._log_metric("high_priority_recommendations", priorities['HIGH'])
         
         # Save recommendations
-        rec_file = f"/tmp/recommendations_{self.current_run_id}.json"
-        with open(rec_file, 'w') as f:
-            json.dump(recommendations, f, indent=2)
-        
-        mlflow.log_artifact(rec_file, "recommendations")
+        self._add_artifact("recommendations", f"recommendations_{self.current_run_id}.json", recommendations)
     
     def log_performance_metrics(self, execution_time: float, facilities_analyzed: int):
         """Log performance metrics"""
-        mlflow.log_metric("execution_time_seconds", execution_time)
-        mlflow.log_metric("facilities_analyzed", facilities_analyzed)
-        mlflow.log_metric("avg_time_per_facility", execution_time / max(facilities_analyzed, 1))
+        self._log_metric("execution_time_seconds", execution_time)
+        self._log_metric("facilities_analyzed", facilities_analyzed)
+        self._log_metric("avg_time_per_facility", execution_time / max(facilities_analyzed, 1))
     
     def log_quality_metrics(self, 
                           citation_coverage: float,
                           reasoning_depth: int,
                           data_completeness: float):
         """Log quality metrics for the analysis"""
-        mlflow.log_metric("citation_coverage", citation_coverage)
-        mlflow.log_metric("reasoning_depth", reasoning_depth)
-        mlflow.log_metric("data_completeness", data_completeness)
+        self._log_metric("citation_coverage", citation_coverage)
+        self._log_metric("reasoning_depth", reasoning_depth)
+        self._log_metric("data_completeness", data_completeness)
     
     def end_run(self):
-        """End the current MLflow run"""
+        """Flush buffered values and end the current MLflow run"""
+        import mlflow
+        
         if mlflow.active_run():
+            self.flush()
+            self.flush_artifacts()
             mlflow.end_run()
         self.current_run_id = None
 
@@ -116,22 +255,22 @@ def track_agent_execution(agent, query: str, profiles: List[Any]) -> Dict[str, A
     """
     Execute agent with full MLflow tracking
     """
-    import time
-    
     tracker = HealthcareAgentTracker()
     
     # Start tracking
-    run_id = tracker.start_run(f"query_{datetime.now().strftime('%H%M%S')}")
+    started_at = datetime.now()
+    run_id = tracker.start_run(f"query_{started_at.strftime('%H%M%S')}")
     
-    start_time = time.time()
+    # Monotonic clock: elapsed time is unaffected by wall-clock adjustments
+    start_time = time.monotonic()
     
     # Run agent
     result = agent.run(query)
     
-    execution_time = time.time() - start_time
+    execution_time = time.monotonic() - start_time
     
     # Log everything
-    tracker.log_query(query, "natural_language")
+    tracker.log_query(query, "natural_language", started_at)
     tracker.log_data_sources(
         len(profiles),
         list(set(p.region for p in profiles))
@@ -142,8 +281,9 @@ def track_agent_execution(agent, query: str, profiles: List[Any]) -> Dict[str, A
     tracker.log_performance_metrics(execution_time, len(profiles))
     
     # Calculate quality metrics
-    total_steps = len(result['reasoning_steps'])
-    citations_per_step = sum(len(s.get('citations', [])) for s in result['reasoning_steps'])
+    reasoning_steps = result['reasoning_steps']
+    total_steps = len(reasoning_steps)
+    citations_per_step = sum(len(s.get('citations', ())) for s in reasoning_steps)
     citation_coverage = citations_per_step / max(total_steps, 1)
     
     tracker.log_quality_metrics(
@@ -153,8 +293,8 @@ def track_agent_execution(agent, query: str, profiles: List[Any]) -> Dict[str, A
     )
     
     # Tag the run
-    mlflow.set_tag("status", "success")
-    mlflow.set_tag("agent_version", "1.0")
+    tracker.set_tag("status", "success")
+    tracker.set_tag("agent_version", "1.0")
     
     tracker.end_run()
     
@@ -165,10 +305,13 @@ def track_agent_execution(agent, query: str, profiles: List[Any]) -> Dict[str, A
     }
 
 
-def compare_experiments(experiment_name: str = "medical_desert_agent"):
+def compare_experiments(experiment_name: str = "medical_desert_agent", top_n: int = 5):
     """
     Compare different agent runs to identify best configurations
+    Prints the top_n runs; returns every run, sorted by citation coverage
     """
+    import mlflow
+    
     # Get all runs from the experiment
     experiment = mlflow.get_experiment_by_name(experiment_name)
     
@@ -176,20 +319,22 @@ def compare_experiments(experiment_name: str = "medical_desert_agent"):
         print(f"No experiment found with name: {experiment_name}")
         return None
     
-    runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id])
+    # Let the tracking store sort; every run is returned, so the count and
+    # the top runs come from the one query
+    runs_sorted = mlflow.search_runs(
+        experiment_ids=[experiment.experiment_id],
+        order_by=['metrics.citation_coverage DESC']
+    )
     
-    if len(runs) == 0:
+    if len(runs_sorted) == 0:
         print("No runs found in experiment")
         return None
     
-    # Sort by quality metrics
-    runs_sorted = runs.sort_values('metrics.citation_coverage', ascending=False)
-    
     print("\n=== Experiment Comparison ===\n")
-    print(f"Total Runs: {len(runs)}\n")
+    print(f"Total Runs: {len(runs_sorted)}\n")
     
-    print("Top 5 Runs by Citation Coverage:")
-    for idx, row in runs_sorted.head(5).iterrows():
+    print(f"Top {top_n} Runs by Citation Coverage:")
+    for row in runs_sorted.head(top_n).to_dict('records'):
         print(f"\nRun ID: {row['run_id']}")
         print(f"  Query: {row.get('params.query', 'N/A')}")
         print(f"  Citation Coverage: {row.get('metrics.citation_coverage', 0):.2f}")
@@ -204,35 +349,42 @@ def create_experiment_dashboard():
     """
     Create a summary dashboard of all experiments
     """
+    import mlflow
+    
     experiment = mlflow.get_experiment_by_name("medical_desert_agent")
     
     if experiment is None:
         print("No experiments found")
         return
     
+    # Every run counts towards the totals; runs without a metric are
+    # skipped by the aggregation (NaN), not filtered out of the search
     runs = mlflow.search_runs(experiment_ids=[experiment.experiment_id])
     
     if len(runs) == 0:
         print("No runs found")
         return
     
-    # Summary statistics
+    # Summary statistics, computed in a single aggregation pass
+    stats = runs[list(DASHBOARD_METRICS)].agg(['mean', 'min', 'max', 'sum'])
+    stats.columns = [column[len('metrics.'):] for column in stats.columns]
+    
     print("\n" + "="*60)
     print("MEDICAL DESERT AGENT - EXPERIMENT DASHBOARD")
     print("="*60)
     
     print(f"\n📊 Overall Statistics:")
     print(f"   Total Queries Processed: {len(runs)}")
-    print(f"   Avg Execution Time: {runs['metrics.execution_time_seconds'].mean():.2f}s")
-    print(f"   Avg Citation Coverage: {runs['metrics.citation_coverage'].mean():.2f}")
-    print(f"   Avg Reasoning Depth: {runs['metrics.reasoning_depth'].mean():.1f} steps")
-    print(f"   Total Recommendations Generated: {runs['metrics.recommendation_count'].sum():.0f}")
+    print(f"   Avg Execution Time: {stats.at['mean', 'execution_time_seconds']:.2f}s")
+    print(f"   Avg Citation Coverage: {stats.at['mean', 'citation_coverage']:.2f}")
+    print(f"   Avg Reasoning Depth: {stats.at['mean', 'reasoning_depth']:.1f} steps")
+    print(f"   Total Recommendations Generated: {stats.at['sum', 'recommendation_count']:.0f}")
     
     print(f"\n🎯 Performance Metrics:")
-    print(f"   Fastest Query: {runs['metrics.execution_time_seconds'].min():.2f}s")
-    print(f"   Slowest Query: {runs['metrics.execution_time_seconds'].max():.2f}s")
-    print(f"   Most Citations: {runs['metrics.total_citations'].max():.0f}")
-    print(f"   Deepest Reasoning: {runs['metrics.reasoning_depth'].max():.0f} steps")
+    print(f"   Fastest Query: {stats.at['min', 'execution_time_seconds']:.2f}s")
+    print(f"   Slowest Query: {stats.at['max', 'execution_time_seconds']:.2f}s")
+    print(f"   Most Citations: {stats.at['max', 'total_citations']:.0f}")
+    print(f"   Deepest Reasoning: {stats.at['max', 'reasoning_depth']:.0f} steps")
     
     print("\n" + "="*60 + "\n")
 
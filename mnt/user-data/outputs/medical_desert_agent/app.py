@@ -9,8 +9,11 @@ from document_parser import parse_facility_dataset, identify_medical_deserts
 from agentic_planner import HealthcareAgent, EXAMPLE_QUERIES
 from visualization import create_medical_desert_map, create_summary_statistics
 import os
+import io
+import csv
+import math
 from datetime import datetime
-import json
+import orjson
 
 
 # Page configuration
@@ -22,7 +25,7 @@ st.set_page_config(
 )
 
 # Custom CSS
-st.markdown("""
+CUSTOM_CSS = """
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -73,24 +76,102 @@ st.markdown("""
         font-size: 0.85rem;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+
+DATA_PATH = '/home/claude/medical_desert_agent/ghana_facilities.csv'
+
 
+def csv_version(path):
+    """Cheap dataset version key: (mtime_ns, size), or None if the file is missing"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
 
-@st.cache_data
-def load_data():
-    """Load and parse facility data (cached)"""
-    data_path = '/home/claude/medical_desert_agent/ghana_facilities.csv'
-    if os.path.exists(data_path):
-        return parse_facility_dataset(data_path)
-    return []
 
+# Every cached view below is keyed on the dataset version; the unhashed
+# _profiles argument must be the load_data() result for that version
 
-@st.cache_resource
-def initialize_agent(_profiles):
+@st.cache_data(max_entries=2)
+def load_data(version):
+    """Load and parse facility data once per dataset version (cached)"""
+    if version is None:
+        return []
+    return parse_facility_dataset(DATA_PATH)
+
+
+@st.cache_resource(max_entries=2)
+def initialize_agent(version, _profiles):
     """Initialize the healthcare agent (cached)"""
     return HealthcareAgent(_profiles)
 
 
+@st.cache_data(max_entries=2)
+def get_summary_statistics(version, _profiles):
+    """Compute dashboard statistics once per dataset (cached)"""
+    return create_summary_statistics(_profiles)
+
+
+@st.cache_data(max_entries=2)
+def get_filter_options(version, _profiles):
+    """Distinct regions and facility types for the explorer filters (cached)"""
+    regions = sorted({p.region for p in _profiles})
+    facility_types = sorted({p.facility_type for p in _profiles})
+    return regions, facility_types
+
+
+@st.cache_data(max_entries=2)
+def get_profile_table(version, _profiles):
+    """Columnar view of the profile fields used for filtering (cached)"""
+    return pd.DataFrame({
+        'region': pd.Categorical([p.region for p in _profiles]),
+        'facility_type': pd.Categorical([p.facility_type for p in _profiles]),
+        'desert_risk_score': [p.desert_risk_score for p in _profiles]
+    })
+
+
+@st.cache_data(max_entries=2)
+def get_map_html(version, _profiles):
+    """Generate the desert map and read its HTML once per dataset (cached)"""
+    map_path = create_medical_desert_map(_profiles, '/tmp/medical_desert_map.html')
+    with open(map_path, 'r') as f:
+        return f.read()
+
+
+@st.cache_data(max_entries=2)
+def get_export_csv(version, _profiles):
+    """Write the full analysis CSV straight from the profiles (cached)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(
+        (p.facility_id, p.facility_name, p.region, p.facility_type,
+         p.desert_risk_score, p.capability_score,
+         ', '.join(p.specialties), ', '.join(p.gaps))
+        for p in _profiles
+    )
+    return buffer.getvalue()
+
+
+# Header row of the full analysis CSV export
+EXPORT_COLUMNS = ('Facility ID', 'Name', 'Region', 'Type', 'Desert Risk Score',
+                  'Capability Score', 'Specialties', 'Gaps')
+
+# Facility cards rendered per Facility Explorer page
+EXPLORER_PAGE_SIZE = 25
+
+# Facility Explorer risk filter: label -> [lower, upper) desert risk bounds
+RISK_BANDS = {
+    "Critical (75+)": (75, float('inf')),
+    "High (60-74)": (60, 75),
+    "Moderate (40-59)": (40, 60),
+    "Low (<40)": (float('-inf'), 40),
+}
+
+
 def display_facility_card(profile):
     """Display a facility as a card"""
     
@@ -156,7 +237,8 @@ def main():
     
     # Load data
     with st.spinner("Loading facility data..."):
-        profiles = load_data()
+        data_version = csv_version(DATA_PATH)
+        profiles = load_data(data_version)
     
     if not profiles:
         st.error("⚠️ No data found. Please ensure ghana_facilities.csv exists.")
@@ -174,7 +256,7 @@ def main():
         st.header("Overview Dashboard")
         
         # Statistics
-        stats = create_summary_statistics(profiles)
+        stats = get_summary_statistics(data_version, profiles)
         
         # Key metrics in columns
         col1, col2, col3, col4 = st.columns(4)
@@ -254,7 +336,7 @@ def main():
         st.write("Ask questions in natural language about healthcare resources in Ghana")
         
         # Initialize agent
-        agent = initialize_agent(profiles)
+        agent = initialize_agent(data_version, profiles)
         
         # Example queries
         st.subheader("💡 Try these questions:")
@@ -312,12 +394,9 @@ def main():
         st.header("Interactive Medical Desert Map")
         
         with st.spinner("Generating map..."):
-            map_path = create_medical_desert_map(profiles, '/tmp/medical_desert_map.html')
+            map_html = get_map_html(data_version, profiles)
         
         # Display map
-        with open(map_path, 'r') as f:
-            map_html = f.read()
-        
         st.components.v1.html(map_html, height=600, scrolling=True)
         
         # Download button
@@ -334,45 +413,46 @@ def main():
         
         # Filters
         col1, col2, col3 = st.columns(3)
+        regions, facility_types = get_filter_options(data_version, profiles)
         
         with col1:
-            regions = list(set(p.region for p in profiles))
-            selected_region = st.selectbox("Filter by Region", ["All"] + sorted(regions))
+            selected_region = st.selectbox("Filter by Region", ["All"] + regions)
         
         with col2:
             risk_filter = st.selectbox(
                 "Filter by Risk Level",
-                ["All", "Critical (75+)", "High (60-74)", "Moderate (40-59)", "Low (<40)"]
+                ["All", *RISK_BANDS]
             )
         
         with col3:
-            facility_types = list(set(p.facility_type for p in profiles))
-            selected_type = st.selectbox("Filter by Type", ["All"] + sorted(facility_types))
+            selected_type = st.selectbox("Filter by Type", ["All"] + facility_types)
         
-        # Apply filters
-        filtered = profiles
+        # Apply filters as one combined mask over the columnar table
+        table = get_profile_table(data_version, profiles)
+        mask = pd.Series(True, index=table.index)
         
         if selected_region != "All":
-            filtered = [p for p in filtered if p.region == selected_region]
+            mask &= table['region'].eq(selected_region)
         
         if selected_type != "All":
-            filtered = [p for p in filtered if p.facility_type == selected_type]
+            mask &= table['facility_type'].eq(selected_type)
         
         if risk_filter != "All":
-            if "Critical" in risk_filter:
-                filtered = [p for p in filtered if p.desert_risk_score >= 75]
-            elif "High" in risk_filter:
-                filtered = [p for p in filtered if 60 <= p.desert_risk_score < 75]
-            elif "Moderate" in risk_filter:
-                filtered = [p for p in filtered if 40 <= p.desert_risk_score < 60]
-            elif "Low" in risk_filter:
-                filtered = [p for p in filtered if p.desert_risk_score < 40]
-        
-        st.write(f"**Showing {len(filtered)} of {len(profiles)} facilities**")
-        
-        # Display facilities
-        for profile in sorted(filtered, key=lambda x: x.desert_risk_score, reverse=True):
-            display_facility_card(profile)
+            lower, upper = RISK_BANDS[risk_filter]
+            scores = table['desert_risk_score']
+            mask &= scores.ge(lower) & scores.lt(upper)
+        
+        matched = table['desert_risk_score'][mask].sort_values(ascending=False, kind='stable')
+        
+        page_count = max(1, math.ceil(len(matched) / EXPLORER_PAGE_SIZE))
+        page_number = st.number_input("Page", min_value=1, max_value=page_count, value=1)
+        start = (page_number - 1) * EXPLORER_PAGE_SIZE
+        
+        st.write(f"**Showing {len(matched)} of {len(profiles)} facilities** (page {page_number} of {page_count})")
+        
+        # Display only the current page of facilities
+        for i in matched.index[start:start + EXPLORER_PAGE_SIZE]:
+            display_facility_card(profiles[i])
     
     # Reports Page
     elif page == "📈 Reports":
@@ -405,32 +485,18 @@ def main():
         
         with col1:
             # Export as CSV
-            export_data = []
-            for p in profiles:
-                export_data.append({
-                    'Facility ID': p.facility_id,
-                    'Name': p.facility_name,
-                    'Region': p.region,
-                    'Type': p.facility_type,
-                    'Desert Risk Score': p.desert_risk_score,
-                    'Capability Score': p.capability_score,
-                    'Specialties': ', '.join(p.specialties),
-                    'Gaps': ', '.join(p.gaps)
-                })
-            
-            df_export = pd.DataFrame(export_data)
-            csv = df_export.to_csv(index=False)
+            csv_data = get_export_csv(data_version, profiles)
             
             st.download_button(
                 label="Download Full Analysis (CSV)",
-                data=csv,
+                data=csv_data,
                 file_name=f"ghana_medical_analysis_{datetime.now().strftime('%Y%m%d')}.csv",
                 mime="text/csv"
             )
         
         with col2:
             # Export desert regions as JSON
-            json_data = json.dumps(deserts, indent=2)
+            json_data = orjson.dumps(deserts, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
             st.download_button(
                 label="Download Desert Regions (JSON)",
                 data=json_data,
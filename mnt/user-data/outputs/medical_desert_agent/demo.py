@@ -9,6 +9,8 @@ import csv
 from dataclasses import dataclass, field
 from typing import List, Dict, Any, Tuple
 import re
+import sys
+from operator import itemgetter
 
 
 # ============================================================================
@@ -45,109 +47,190 @@ class FacilityProfile:
     desert_risk_score: float = 0.0
 
 
+@dataclass
+class FacilityTable:
+    """Column-per-field view of the profiles used for regional aggregation"""
+    regions: List[str]
+    region_codes: List[int]
+    risk: List[float]
+    capability: List[float]
+    gap_counts: List[int]
+    
+    @classmethod
+    def from_profiles(cls, profiles: List[FacilityProfile]) -> 'FacilityTable':
+        """Build the columns in one pass; region codes follow first appearance"""
+        codes: Dict[str, int] = {}
+        region_codes = [codes.setdefault(p.region, len(codes)) for p in profiles]
+        return cls(
+            regions=list(codes),
+            region_codes=region_codes,
+            risk=[p.desert_risk_score for p in profiles],
+            capability=[p.capability_score for p in profiles],
+            gap_counts=[len(p.gaps) for p in profiles]
+        )
+    
+    def region_totals(self) -> Tuple[List[int], List[float], List[float], List[int]]:
+        """Per-region facility count and risk, capability and gap totals, indexed by region code"""
+        n = len(self.regions)
+        counts, total_risk, total_capability, total_gaps = [0] * n, [0] * n, [0] * n, [0] * n
+        
+        for code, risk, capability, gaps in zip(self.region_codes, self.risk, self.capability, self.gap_counts):
+            counts[code] += 1
+            total_risk[code] += risk
+            total_capability[code] += capability
+            total_gaps[code] += gaps
+        
+        return counts, total_risk, total_capability, total_gaps
+
+
 # ============================================================================
 # DOCUMENT PARSER
 # ============================================================================
 
+# CSV columns read by the parser, in SimpleDocumentParser._parse_facility argument order
+FACILITY_COLUMNS = (
+    'facility_id', 'facility_name', 'region', 'district', 'latitude', 'longitude',
+    'facility_type', 'specialties', 'equipment', 'procedures', 'staff_notes'
+)
+
+# Columns the CSV may omit, with the value used in their place
+OPTIONAL_COLUMNS = {'staff_notes': ''}
+
+# Capability multiplier per facility type; other types use the default
+TYPE_MULTIPLIERS = {
+    'Teaching Hospital': 1.0,
+    'Regional Hospital': 0.7,
+    'District Hospital': 0.4,
+    'Mission Hospital': 0.5
+}
+DEFAULT_TYPE_MULTIPLIER = 0.3
+
+# Every phrase the gap rules look for, matched case-insensitively in one scan.
+# The lookahead reports overlapping cues (e.g. "broken" + "no surgeon" in "brokeno surgeon").
+GAP_CUE_PATTERN = re.compile(
+    r'(?=(no surgeon|no neurosurgeon|need more|broke down|broken|no |limited|only))',
+    re.IGNORECASE
+)
+
+# Shortage phrases that enable the staffing/equipment gap rules
+SHORTAGE_CUES = {'no ', 'no surgeon', 'no neurosurgeon', 'need more'}
+
+# (cue phrases, gap label, only applies when a shortage cue is present)
+GAP_RULES = (
+    ({'no surgeon', 'no neurosurgeon'}, "Missing surgeon", True),
+    ({'need more'}, "Staff shortage", True),
+    ({'broke down', 'broken'}, "Broken equipment", True),
+    ({'limited', 'only'}, "Limited resources", False),
+)
+
+
+def _intern(value):
+    """sys.intern for str cells; padded (None) cells pass through"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
 class SimpleDocumentParser:
     """Simplified document parser for demo"""
     
     def parse_csv(self, filepath: str) -> List[FacilityProfile]:
         """Parse facility CSV file"""
-        profiles = []
-        
-        with open(filepath, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
+        with open(filepath, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if not header:
+                return []
             
+            # Rows stay plain lists; fields are picked by position, not via a per-row dict.
+            # Like DictReader, a repeated header name maps to its last column
+            positions = {name: i for i, name in enumerate(header)}
+            width = len(header)
+            defaults = []
+            indices = []
+            for name in FACILITY_COLUMNS:
+                if name in positions:
+                    indices.append(positions[name])
+                elif name in OPTIONAL_COLUMNS:
+                    # Missing optional columns read from defaults appended to each row
+                    indices.append(width + len(defaults))
+                    defaults.append(OPTIONAL_COLUMNS[name])
+                else:
+                    raise KeyError(name)
+            pick = itemgetter(*indices)
+            
+            profiles = []
             for row in reader:
-                profile = self._parse_facility(row)
-                profiles.append(profile)
+                if not row:
+                    continue
+                if len(row) < width:
+                    # Short rows are padded with None, as DictReader does
+                    row += [None] * (width - len(row))
+                if defaults:
+                    row += defaults
+                profiles.append(self._parse_facility(*pick(row)))
         
+        self._compute_scores(profiles)
         return profiles
     
-    def _parse_facility(self, row: Dict) -> FacilityProfile:
+    def _parse_facility(self, facility_id: str, facility_name: str, region: str,
+                        district: str, latitude: str, longitude: str,
+                        facility_type: str, specialties: str, equipment: str,
+                        procedures: str, notes: str) -> FacilityProfile:
         """Parse a single facility record"""
-        facility_id = row['facility_id']
-        
-        # Create profile
+        # Create profile; low-cardinality fields are interned so every profile
+        # shares one string per region/type and dict lookups hit the identity check
         profile = FacilityProfile(
             facility_id=facility_id,
-            facility_name=row['facility_name'],
-            region=row['region'],
-            district=row['district'],
-            coordinates=(float(row['latitude']), float(row['longitude'])),
-            facility_type=row['facility_type']
+            facility_name=facility_name,
+            region=_intern(region),
+            district=_intern(district),
+            coordinates=(float(latitude), float(longitude)),
+            facility_type=_intern(facility_type)
         )
         
         # Parse structured fields
-        if row['specialties']:
-            profile.specialties = [s.strip() for s in row['specialties'].split(',')]
+        if specialties:
+            profile.specialties = [s.strip() for s in specialties.split(',')]
         
-        if row['equipment']:
-            profile.equipment = [e.strip() for e in row['equipment'].split(',')]
+        if equipment:
+            profile.equipment = [e.strip() for e in equipment.split(',')]
         
-        if row['procedures']:
-            profile.procedures = [p.strip() for p in row['procedures'].split(',')]
+        if procedures:
+            profile.procedures = [p.strip() for p in procedures.split(',')]
         
         # Extract from staff notes
-        notes = row.get('staff_notes', '')
         if notes:
             self._extract_gaps(profile, notes)
         
-        # Compute scores
-        self._compute_scores(profile)
-        
         return profile
     
     def _extract_gaps(self, profile: FacilityProfile, notes: str):
         """Extract capability gaps from notes"""
-        notes_lower = notes.lower()
+        cues = {match.group(1).lower() for match in GAP_CUE_PATTERN.finditer(notes)}
+        shortage = not cues.isdisjoint(SHORTAGE_CUES)
         
-        # Detect shortages
-        if 'no ' in notes_lower or 'need more' in notes_lower:
-            # Simple extraction
-            if 'no surgeon' in notes_lower or 'no neurosurgeon' in notes_lower:
-                profile.gaps.append("Missing surgeon")
-            
-            if 'need more' in notes_lower:
-                profile.gaps.append("Staff shortage")
-            
-            if 'broke down' in notes_lower or 'broken' in notes_lower:
-                profile.gaps.append("Broken equipment")
-        
-        # Detect limited resources
-        if 'limited' in notes_lower or 'only' in notes_lower:
-            profile.gaps.append("Limited resources")
+        for rule_cues, gap, needs_shortage in GAP_RULES:
+            if (shortage or not needs_shortage) and not cues.isdisjoint(rule_cues):
+                profile.gaps.append(gap)
     
-    def _compute_scores(self, profile: FacilityProfile):
-        """Compute capability and risk scores"""
-        # Capability score
-        base_score = (
-            len(profile.specialties) * 5 +
-            len(profile.equipment) * 3 +
-            len(profile.procedures) * 2
-        )
-        
-        type_multiplier = {
-            'Teaching Hospital': 1.0,
-            'Regional Hospital': 0.7,
-            'District Hospital': 0.4,
-            'Mission Hospital': 0.5
-        }.get(profile.facility_type, 0.3)
-        
-        profile.capability_score = min(100, base_score * type_multiplier)
+    def _compute_scores(self, profiles: List[FacilityProfile]):
+        """Compute capability and risk scores for all profiles in one pass"""
+        type_multiplier = TYPE_MULTIPLIERS.get
         
-        # Desert risk score
-        risk = 0
-        
-        if profile.capability_score < 30:
-            risk += 30
-        elif profile.capability_score < 50:
-            risk += 15
-        
-        risk += min(30, len(profile.gaps) * 10)
-        
-        profile.desert_risk_score = min(100, risk)
+        for profile in profiles:
+            # Capability score
+            base_score = (
+                len(profile.specialties) * 5 +
+                len(profile.equipment) * 3 +
+                len(profile.procedures) * 2
+            )
+            capability = min(100, base_score * type_multiplier(profile.facility_type, DEFAULT_TYPE_MULTIPLIER))
+            profile.capability_score = capability
+            
+            # Desert risk score
+            risk = 30 if capability < 30 else 15 if capability < 50 else 0
+            risk += min(30, len(profile.gaps) * 10)
+            
+            profile.desert_risk_score = min(100, risk)
 
 
 # ============================================================================
@@ -159,6 +242,7 @@ class SimpleHealthcareAgent:
     
     def __init__(self, profiles: List[FacilityProfile]):
         self.profiles = profiles
+        self.table = FacilityTable.from_profiles(profiles)
     
     def analyze(self, query: str) -> Dict[str, Any]:
         """Analyze a query and generate response"""
@@ -187,31 +271,37 @@ class SimpleHealthcareAgent:
         
         # Step 2: Gather data
         if query_type == 'medical_desert':
-            high_risk = [p for p in self.profiles if p.desert_risk_score >= 60]
-            result['findings'].append(f"Found {len(high_risk)} high-risk facilities")
+            # Group high-risk facilities by region code, keeping only observed
+            # regions in order of their first high-risk facility
+            table = self.table
+            counts = [0] * len(table.regions)
+            total_risk = [0] * len(table.regions)
+            observed = []
+            for code, risk in zip(table.region_codes, table.risk):
+                if risk >= 60:
+                    if not counts[code]:
+                        observed.append(code)
+                    counts[code] += 1
+                    total_risk[code] += risk
             
-            # Group by region
-            regions = {}
-            for p in high_risk:
-                if p.region not in regions:
-                    regions[p.region] = []
-                regions[p.region].append(p)
+            result['findings'].append(f"Found {sum(counts)} high-risk facilities")
             
             result['reasoning_steps'].append({
                 'step': 2,
                 'action': 'Data Gathering',
-                'result': f'Analyzed {len(regions)} regions with high risk'
+                'result': f'Analyzed {len(observed)} regions with high risk'
             })
             
             # Generate recommendations
-            for region, facilities in sorted(regions.items(), key=lambda x: len(x[1]), reverse=True):
-                avg_risk = sum(f.desert_risk_score for f in facilities) / len(facilities)
+            for code in sorted(observed, key=counts.__getitem__, reverse=True):
+                region = table.regions[code]
+                avg_risk = total_risk[code] / counts[code]
                 
                 result['recommendations'].append({
                     'region': region,
                     'priority': 'HIGH' if avg_risk >= 70 else 'MEDIUM',
                     'action': f'Deploy resources to {region}',
-                    'rationale': f'{len(facilities)} facilities at risk (avg: {avg_risk:.0f}/100)'
+                    'rationale': f'{counts[code]} facilities at risk (avg: {avg_risk:.0f}/100)'
                 })
         
         elif query_type == 'staffing':
@@ -261,12 +351,17 @@ def run_demo():
     print(f"\n\n🚨 Step 2: Identifying Medical Deserts")
     print("-" * 70)
     
-    high_risk = [p for p in profiles if p.desert_risk_score >= 60]
-    critical = [p for p in profiles if p.desert_risk_score >= 75]
+    # One scan collects the high-risk facilities and counts the critical ones among them
+    high_risk = []
+    critical_count = 0
+    for p in profiles:
+        if p.desert_risk_score >= 60:
+            high_risk.append(p)
+            critical_count += p.desert_risk_score >= 75
     
     print(f"✅ Risk Analysis:")
-    print(f"  Critical Risk (75+): {len(critical)} facilities")
-    print(f"  High Risk (60-74): {len(high_risk) - len(critical)} facilities")
+    print(f"  Critical Risk (75+): {critical_count} facilities")
+    print(f"  High Risk (60-74): {len(high_risk) - critical_count} facilities")
     print(f"  Total High Risk: {len(high_risk)} facilities\n")
     
     if high_risk:
@@ -303,32 +398,19 @@ def run_demo():
     print(f"\n\n📈 Step 4: Regional Summary")
     print("-" * 70)
     
-    regions = {}
-    for p in profiles:
-        if p.region not in regions:
-            regions[p.region] = {
-                'count': 0,
-                'total_risk': 0,
-                'total_capability': 0,
-                'gaps': 0
-            }
-        
-        regions[p.region]['count'] += 1
-        regions[p.region]['total_risk'] += p.desert_risk_score
-        regions[p.region]['total_capability'] += p.capability_score
-        regions[p.region]['gaps'] += len(p.gaps)
+    table = agent.table
+    counts, total_risk, _, total_gaps = table.region_totals()
     
     print("\nRegion Overview (sorted by risk):\n")
     print(f"{'Region':<25} {'Facilities':<12} {'Avg Risk':<12} {'Total Gaps':<12}")
     print("-" * 70)
     
-    for region in sorted(regions.keys(), 
-                        key=lambda r: regions[r]['total_risk']/regions[r]['count'], 
-                        reverse=True):
-        data = regions[region]
-        avg_risk = data['total_risk'] / data['count']
+    for code in sorted(range(len(table.regions)), 
+                       key=lambda c: total_risk[c]/counts[c], 
+                       reverse=True):
+        avg_risk = total_risk[code] / counts[code]
         
-        print(f"{region:<25} {data['count']:<12} {avg_risk:<12.1f} {data['gaps']:<12}")
+        print(f"{table.regions[code]:<25} {counts[code]:<12} {avg_risk:<12.1f} {total_gaps[code]:<12}")
     
     # Summary
     print("\n\n" + "="*70)
@@ -3,22 +3,88 @@ Orchestrator - LangGraph-based Agent Coordination
 Coordinates extraction, analysis, and response generation
 """
 
-from typing import Dict, Any, List, Optional, TypedDict, Annotated
+from typing import Dict, Any, List, Optional, TypedDict, Annotated, Hashable
+from collections import OrderedDict
 import operator
+import re
+import threading
 from langgraph.graph import StateGraph, END
 import pandas as pd
 import json
 import time
 
-from extraction_agent import ExtractionAgent, ExtractedCapability
+from extraction_agent import ExtractionAgent, ExtractedCapability, _build_automaton
 from analysis_agent import AnalysisAgent, MedicalDesert, CapabilityGap
 from citation_tracker import CitationTracker, Citation
 
+# Query understanding vocabulary; regions and procedures are matched in list order
+QUESTION_WORDS = ('which', 'what', 'find', 'show', 'list')
+GAP_WORDS = ('gap', 'missing', 'lack')
+COVERAGE_WORDS = ('analyze', 'coverage')
+QUERY_REGIONS = ('greater accra', 'ashanti', 'northern', 'western', 'volta',
+                 'central', 'eastern', 'upper east', 'upper west')
+QUERY_PROCEDURES = ('cardiac surgery', 'neurosurgery', 'cesarean', 'dialysis',
+                    'transplant', 'icu', 'ct scan', 'mri')
+QUERY_KEYWORDS = (QUESTION_WORDS + GAP_WORDS + ('desert',) + COVERAGE_WORDS
+                  + QUERY_REGIONS + QUERY_PROCEDURES)
+
+# One automaton finds every query keyword in a single pass (None without pyahocorasick)
+_QUERY_AUTOMATON = _build_automaton(QUERY_KEYWORDS)
+
+# Fallback: one compiled alternation. The lookahead reports overlapping keywords;
+# no keyword is a prefix of another, so one alternative per position is enough.
+_QUERY_PATTERN = re.compile(
+    '(?=(' + '|'.join(map(re.escape, sorted(QUERY_KEYWORDS, key=len, reverse=True))) + '))'
+)
+
+
+def _query_keywords(query: str) -> set:
+    """Vocabulary keywords occurring (as substrings) in the lowercased query"""
+    if _QUERY_AUTOMATON is None:
+        return {match.group(1) for match in _QUERY_PATTERN.finditer(query)}
+    return {keyword for _, keyword in _QUERY_AUTOMATON.iter(query)}
+
+
+# Marker shown next to each desert in responses, by severity
+SEVERITY_EMOJI = {
+    'critical': '🔴',
+    'severe': '🟠',
+    'moderate': '🟡'
+}
+
+# Free-text fields that fully determine a facility's extraction result
+EXTRACTION_TEXT_FIELDS = ('procedures_free_text', 'equipment_free_text', 'specialties_free_text')
+
+# Most extraction results kept across queries (least recently used are evicted)
+EXTRACT_CACHE_SIZE = 4096
+
+# Facility columns read by the extraction node (absent ones fall back to defaults)
+RECORD_COLUMNS = (
+    'facility_id', 'facility_name', 'region', 'district', 'facility_type',
+    'latitude', 'longitude', 'bed_capacity', 'staff_count'
+) + EXTRACTION_TEXT_FIELDS
+
+
+def _copy_extraction(cached: Dict[str, Any], facility: Dict[str, Any]) -> Dict[str, Any]:
+    """Per-row copy of a cached extraction result, carrying this row's identity"""
+    extracted = dict(cached)
+    extracted.update({
+        'facility_id': facility.get('facility_id'),
+        'facility_name': facility.get('facility_name'),
+        'procedures': list(cached['procedures']),
+        'equipment': list(cached['equipment']),
+        'specialties': list(cached['specialties']),
+        'anomalies': list(cached['anomalies'])
+    })
+    return extracted
+
+
 class AgentState(TypedDict):
     """State passed between agents in the graph"""
     # Input
     query: str
-    raw_facilities_data: List[Dict[str, Any]]
+    raw_facilities: pd.DataFrame  # rows become records only when extracted
+    region_index: Dict[str, Any]  # region -> positional row indices
     
     # Query understanding
     intent: Optional[str]
@@ -43,6 +109,14 @@ class AgentState(TypedDict):
     errors: List[str]
 
 
+def build_region_index(facilities_df: pd.DataFrame) -> Dict[str, Any]:
+    """Map each region to the positional indices of its rows"""
+    return {
+        str(region): positions
+        for region, positions in facilities_df.groupby("region", observed=True).indices.items()
+    }
+
+
 class MedicalIDPOrchestrator:
     """
     Orchestrates the full IDP pipeline using LangGraph
@@ -59,6 +133,14 @@ class MedicalIDPOrchestrator:
         self.extraction_agent = ExtractionAgent(api_key)
         self.analysis_agent = AnalysisAgent()
         
+        # Extraction results keyed by a facility's free-text fields; rows with
+        # text seen before (in this or an earlier query) are not re-extracted.
+        # LRU-bounded, cleared when the dataset version changes, and locked
+        # because one orchestrator may serve several sessions at once
+        self._extract_cache: OrderedDict[tuple, Dict[str, Any]] = OrderedDict()
+        self._extract_cache_lock = threading.Lock()
+        self._dataset_version: Optional[Hashable] = None
+        
         # Build the agent graph
         self.graph = self._build_graph()
     
@@ -66,7 +148,8 @@ class MedicalIDPOrchestrator:
         """Build the LangGraph workflow"""
         workflow = StateGraph(AgentState)
         
-        # Add nodes
+        # Add nodes; each returns only the state keys it changes, so the
+        # facilities DataFrame and tracker are never rewritten between steps
         workflow.add_node("understand_query", self._understand_query_node)
         workflow.add_node("extract_capabilities", self._extract_capabilities_node)
         workflow.add_node("analyze_data", self._analyze_data_node)
@@ -84,7 +167,9 @@ class MedicalIDPOrchestrator:
     def process_query(
         self,
         query: str,
-        facilities_df: pd.DataFrame
+        facilities_df: pd.DataFrame,
+        region_index: Optional[Dict[str, Any]] = None,
+        dataset_version: Optional[Hashable] = None
     ) -> Dict[str, Any]:
         """
         Process a natural language query about medical facilities
@@ -92,16 +177,31 @@ class MedicalIDPOrchestrator:
         Args:
             query: User's natural language question
             facilities_df: DataFrame of facility data
+            region_index: Precomputed region -> row positions (see
+                build_region_index); built from facilities_df if omitted
+            dataset_version: Key identifying the dataset (e.g. CSV mtime and
+                size); cached extractions are dropped when it changes
             
         Returns:
             Dictionary with response, analysis, and citations
         """
         start_time = time.time()
         
+        if region_index is None:
+            region_index = build_region_index(facilities_df)
+        
+        if dataset_version is not None:
+            with self._extract_cache_lock:
+                if dataset_version != self._dataset_version:
+                    self._extract_cache.clear()
+                    self.extraction_agent.clear_llm_cache()
+                    self._dataset_version = dataset_version
+        
         # Initialize state
         initial_state: AgentState = {
             "query": query,
-            "raw_facilities_data": facilities_df.to_dict('records'),
+            "raw_facilities": facilities_df,
+            "region_index": region_index,
             "intent": None,
             "entities": None,
             "extracted_facilities": [],
@@ -130,7 +230,7 @@ class MedicalIDPOrchestrator:
                 "processing_time_ms": (time.time() - start_time) * 1000
             }
     
-    def _understand_query_node(self, state: AgentState) -> AgentState:
+    def _understand_query_node(self, state: AgentState) -> Dict[str, Any]:
         """Node 1: Parse query to understand intent and entities"""
         tracker = state["citation_tracker"]
         step_id = tracker.start_step(
@@ -139,17 +239,17 @@ class MedicalIDPOrchestrator:
             {"query": state["query"]}
         )
         
-        query = state["query"].lower()
+        found = _query_keywords(state["query"].lower())
         
         # Simple intent classification
-        if any(word in query for word in ['which', 'what', 'find', 'show', 'list']):
-            if 'gap' in query or 'missing' in query or 'lack' in query:
+        if not found.isdisjoint(QUESTION_WORDS):
+            if not found.isdisjoint(GAP_WORDS):
                 intent = 'identify_gaps'
-            elif 'desert' in query:
+            elif 'desert' in found:
                 intent = 'find_medical_deserts'
             else:
                 intent = 'find_facilities'
-        elif 'analyze' in query or 'coverage' in query:
+        elif not found.isdisjoint(COVERAGE_WORDS):
             intent = 'analyze_coverage'
         else:
             intent = 'general_query'
@@ -158,44 +258,71 @@ class MedicalIDPOrchestrator:
         entities = {}
         
         # Extract region
-        regions = ['greater accra', 'ashanti', 'northern', 'western', 'volta', 
-                  'central', 'eastern', 'upper east', 'upper west']
-        for region in regions:
-            if region in query:
-                entities['region'] = region.title()
-                break
+        region = next((region for region in QUERY_REGIONS if region in found), None)
+        if region is not None:
+            entities['region'] = region.title()
         
         # Extract capability/procedure
-        procedures = ['cardiac surgery', 'neurosurgery', 'cesarean', 'dialysis', 
-                     'transplant', 'icu', 'ct scan', 'mri']
-        for proc in procedures:
-            if proc in query:
-                entities['capability'] = proc
-                break
-        
-        state["intent"] = intent
-        state["entities"] = entities
+        procedure = next((proc for proc in QUERY_PROCEDURES if proc in found), None)
+        if procedure is not None:
+            entities['capability'] = procedure
         
         tracker.end_step(step_id, {
             "intent": intent,
             "entities": entities
         })
         
-        return state
+        return {"intent": intent, "entities": entities}
     
-    def _extract_capabilities_node(self, state: AgentState) -> AgentState:
+    def _extract_capabilities_node(self, state: AgentState) -> Dict[str, Any]:
         """Node 2: Extract structured capabilities from all facilities"""
         tracker = state["citation_tracker"]
+        raw_facilities = state["raw_facilities"]
+        
+        # Region-scoped facility searches only need that region's rows
+        rows = range(len(raw_facilities))
+        region = (state["entities"] or {}).get('region')
+        if state["intent"] == 'find_facilities' and region in state["region_index"]:
+            rows = state["region_index"][region]
+        
         step_id = tracker.start_step(
             "capability_extraction",
             "Extract structured medical capabilities from unstructured facility text",
-            {"facility_count": len(state["raw_facilities_data"])}
+            {"facility_count": len(rows)}
         )
         
         extracted_facilities = []
-        
-        for i, facility in enumerate(state["raw_facilities_data"]):
-            extracted = self.extraction_agent.extract_from_facility(facility)
+        citation_columns = ([], [], [], [], [], [])
+        
+        # Only the rows being extracted, and the columns read below, become record dicts
+        columns = [column for column in RECORD_COLUMNS if column in raw_facilities.columns]
+        records = raw_facilities.iloc[rows][columns].to_dict('records')
+        keys = [tuple(record.get(field, '') for field in EXTRACTION_TEXT_FIELDS) for record in records]
+        
+        # One batched LLM request per chunk of facilities with unseen text
+        cache = self._extract_cache
+        resolved = {}
+        pending = {}
+        with self._extract_cache_lock:
+            for key, record in zip(keys, records):
+                if key in resolved or key in pending:
+                    continue
+                cached = cache.get(key)
+                if cached is None:
+                    pending[key] = record
+                else:
+                    cache.move_to_end(key)
+                    resolved[key] = cached
+        if pending:
+            batch = self.extraction_agent.extract_batch(list(pending.values()))
+            resolved.update(zip(pending, batch))
+            with self._extract_cache_lock:
+                cache.update(zip(pending, batch))
+                while len(cache) > EXTRACT_CACHE_SIZE:
+                    cache.popitem(last=False)
+        
+        for i, facility, key in zip(rows, records, keys):
+            extracted = _copy_extraction(resolved[key], facility)
             
             # Add original data
             extracted.update({
@@ -210,19 +337,19 @@ class MedicalIDPOrchestrator:
             
             extracted_facilities.append(extracted)
             
-            # Add citations for extracted data
-            for proc in extracted.get('procedures', []):
-                tracker.add_facility_citation(
-                    step_id,
-                    facility_id=facility['facility_id'],
-                    facility_name=facility['facility_name'],
-                    field_name='procedures_free_text',
-                    field_value=facility.get('procedures_free_text', '')[:100],
-                    row_number=i + 1,
-                    confidence=proc.confidence
-                )
-        
-        state["extracted_facilities"] = extracted_facilities
+            # Collect citations for extracted data
+            procedures = extracted.get('procedures', [])
+            if procedures:
+                count = len(procedures)
+                ids, names, fields, values, row_numbers, confidences = citation_columns
+                ids.extend([facility['facility_id']] * count)
+                names.extend([facility['facility_name']] * count)
+                fields.extend(['procedures_free_text'] * count)
+                values.extend([facility.get('procedures_free_text', '')[:100]] * count)
+                row_numbers.extend([int(i) + 1] * count)
+                confidences.extend(proc.confidence for proc in procedures)
+        
+        tracker.add_facility_citations(step_id, *citation_columns)
         
         tracker.end_step(step_id, {
             "extracted_count": len(extracted_facilities),
@@ -230,9 +357,9 @@ class MedicalIDPOrchestrator:
             "total_equipment": sum(len(f.get('equipment', [])) for f in extracted_facilities)
         })
         
-        return state
+        return {"extracted_facilities": extracted_facilities}
     
-    def _analyze_data_node(self, state: AgentState) -> AgentState:
+    def _analyze_data_node(self, state: AgentState) -> Dict[str, Any]:
         """Node 3: Analyze data based on query intent"""
         tracker = state["citation_tracker"]
         step_id = tracker.start_step(
@@ -247,6 +374,8 @@ class MedicalIDPOrchestrator:
         intent = state["intent"]
         entities = state["entities"]
         facilities = state["extracted_facilities"]
+        matches = state["matching_facilities"]
+        analysis = state["analysis_results"]
         
         if intent == 'find_facilities':
             # Find facilities matching capability
@@ -257,38 +386,33 @@ class MedicalIDPOrchestrator:
                 facilities, capability, region
             )
             
-            state["matching_facilities"] = matches
-            
             # Add citations for matches
-            for match in matches:
-                tracker.add_facility_citation(
-                    step_id,
-                    facility_id=match['facility']['facility_id'],
-                    facility_name=match['facility']['facility_name'],
-                    field_name=match['match_type'],
-                    field_value=match['match_name'],
-                    row_number=0,  # Would need to track this
-                    confidence=match['confidence']
-                )
+            tracker.add_facility_citations(
+                step_id,
+                facility_ids=[match['facility']['facility_id'] for match in matches],
+                facility_names=[match['facility']['facility_name'] for match in matches],
+                field_names=[match['match_type'] for match in matches],
+                field_values=[match['match_name'] for match in matches],
+                row_numbers=[0] * len(matches),  # Would need to track this
+                confidences=[match['confidence'] for match in matches]
+            )
         
         elif intent in ['identify_gaps', 'find_medical_deserts', 'analyze_coverage']:
             # Run full regional analysis
             analysis = self.analysis_agent.analyze_regional_coverage(facilities)
-            state["analysis_results"] = analysis
         
         else:
             # General analysis
             analysis = self.analysis_agent.analyze_regional_coverage(facilities)
-            state["analysis_results"] = analysis
         
         tracker.end_step(step_id, {
-            "matches_found": len(state.get("matching_facilities", [])),
-            "analysis_completed": state["analysis_results"] is not None
+            "matches_found": len(matches),
+            "analysis_completed": analysis is not None
         })
         
-        return state
+        return {"matching_facilities": matches, "analysis_results": analysis}
     
-    def _generate_response_node(self, state: AgentState) -> AgentState:
+    def _generate_response_node(self, state: AgentState) -> Dict[str, Any]:
         """Node 4: Generate natural language response"""
         tracker = state["citation_tracker"]
         step_id = tracker.start_step(
@@ -314,14 +438,12 @@ class MedicalIDPOrchestrator:
         else:
             response = "I couldn't find relevant information for your query."
         
-        state["response"] = response
-        
         tracker.end_step(step_id, {
             "response_length": len(response),
             "response_type": intent
         })
         
-        return state
+        return {"response": response}
     
     def _generate_facility_match_response(self, state: AgentState) -> str:
         """Generate response for facility search queries"""
@@ -333,32 +455,36 @@ class MedicalIDPOrchestrator:
             return f"No facilities found with {capability}."
         
         lines = [f"Found {len(matches)} facility/facilities with {capability}:\n"]
-        
-        for i, match in enumerate(matches[:5], 1):  # Top 5
-            facility = match['facility']
-            name = facility['facility_name']
-            region = facility['region']
-            ftype = facility['facility_type']
-            confidence = match['confidence']
-            
-            line = f"{i}. **{name}** ({ftype}, {region})"
-            
-            if match.get('status'):
-                line += f" - Equipment status: {match['status']}"
-            
-            if match.get('details'):
-                line += f"\n   Details: {match['details']}"
-            
-            if confidence < 0.8:
-                line += f" ⚠️ (Confidence: {confidence:.0%})"
-            
-            lines.append(line)
+        lines.extend(
+            self._format_match_line(i, match) for i, match in enumerate(matches[:5], 1)  # Top 5
+        )
         
         if len(matches) > 5:
             lines.append(f"\n...and {len(matches) - 5} more facilities")
         
         return "\n".join(lines)
     
+    def _format_match_line(self, rank: int, match: Dict[str, Any]) -> str:
+        """One ranked line of the facility search response"""
+        facility = match['facility']
+        name = facility['facility_name']
+        region = facility['region']
+        ftype = facility['facility_type']
+        confidence = match['confidence']
+        
+        line = f"{rank}. **{name}** ({ftype}, {region})"
+        
+        if match.get('status'):
+            line += f" - Equipment status: {match['status']}"
+        
+        if match.get('details'):
+            line += f"\n   Details: {match['details']}"
+        
+        if confidence < 0.8:
+            line += f" ⚠️ (Confidence: {confidence:.0%})"
+        
+        return line
+    
     def _generate_desert_response(self, state: AgentState) -> str:
         """Generate response about medical deserts"""
         analysis = state["analysis_results"]
@@ -367,15 +493,13 @@ class MedicalIDPOrchestrator:
         if not deserts:
             return "No critical medical deserts identified. All regions have basic healthcare coverage."
         
-        lines = [f"**Medical Desert Analysis**\n"]
-        lines.append(f"Identified {len(deserts)} underserved regions:\n")
+        lines = [
+            f"**Medical Desert Analysis**\n",
+            f"Identified {len(deserts)} underserved regions:\n"
+        ]
         
         for desert in deserts[:5]:
-            severity_emoji = {
-                'critical': '🔴',
-                'severe': '🟠',
-                'moderate': '🟡'
-            }.get(desert.severity, '⚪')
+            severity_emoji = SEVERITY_EMOJI.get(desert.severity, '⚪')
             
             lines.append(f"{severity_emoji} **{desert.region}** - {desert.severity.upper()}")
             lines.append(f"   Missing capabilities: {len(desert.missing_capabilities)}")
@@ -401,18 +525,18 @@ class MedicalIDPOrchestrator:
         critical_gaps = [g for g in gaps if g.priority == 'critical']
         if critical_gaps:
             lines.append("Critical Gaps:")
-            for gap in critical_gaps[:3]:
-                lines.append(
-                    f"- **{gap.capability_name}**: Missing in {len(gap.regions_affected)} regions"
-                )
+            lines.extend(
+                f"- **{gap.capability_name}**: Missing in {len(gap.regions_affected)} regions"
+                for gap in critical_gaps[:3]
+            )
         
         high_gaps = [g for g in gaps if g.priority == 'high']
         if high_gaps:
             lines.append("\nHigh Priority Gaps:")
-            for gap in high_gaps[:3]:
-                lines.append(
-                    f"- {gap.capability_name}: {len(gap.regions_affected)} regions affected"
-                )
+            lines.extend(
+                f"- {gap.capability_name}: {len(gap.regions_affected)} regions affected"
+                for gap in high_gaps[:3]
+            )
         
         return "\n".join(lines)
     
@@ -421,22 +545,28 @@ class MedicalIDPOrchestrator:
         analysis = state["analysis_results"]
         stats = analysis.get("coverage_statistics", {})
         
-        lines = ["**Healthcare Coverage Analysis**\n"]
-        lines.append(f"Total Facilities: {stats.get('total_facilities', 0)}")
-        lines.append(f"Average Capability Score: {stats.get('average_capability_score', 0)}/100")
-        lines.append(f"Facilities with Issues: {stats.get('facilities_with_anomalies', 0)}\n")
+        lines = [
+            "**Healthcare Coverage Analysis**\n",
+            f"Total Facilities: {stats.get('total_facilities', 0)}",
+            f"Average Capability Score: {stats.get('average_capability_score', 0)}/100",
+            f"Facilities with Issues: {stats.get('facilities_with_anomalies', 0)}\n"
+        ]
         
         # Add recommendations
         recommendations = analysis.get("recommendations", [])
         if recommendations:
             lines.append("**Key Recommendations:**")
-            for rec in recommendations[:3]:
-                lines.append(f"- {rec}")
+            lines.extend(f"- {rec}" for rec in recommendations[:3])
         
         return "\n".join(lines)
     
     def _format_output(self, state: AgentState) -> Dict[str, Any]:
-        """Format final output for user"""
+        """
+        Format final output for user
+        
+        ``citations`` and ``citation_report`` are returned as callables so
+        callers only pay for trace serialization when they display it.
+        """
         return {
             "query": state["query"],
             "response": state["response"],
@@ -444,8 +574,9 @@ class MedicalIDPOrchestrator:
             "entities": state["entities"],
             "matching_facilities": state.get("matching_facilities", []),
             "analysis_results": state.get("analysis_results"),
-            "citations": state["citation_tracker"].to_dict(),
-            "citation_report": state["citation_tracker"].generate_citation_report(),
+            # Zero-arg callables: serialize the trace only if it is shown
+            "citations": state["citation_tracker"].to_dict,
+            "citation_report": state["citation_tracker"].generate_citation_report,
             "processing_time_ms": state["processing_time_ms"],
             "errors": state["errors"]
         }
@@ -1,17 +1,183 @@
 """
 Visualization module for medical desert analysis
 Creates interactive maps showing facility capabilities and risk areas
+
+folium and pandas are imported where they are used, so importing this
+module does not pay for them on code paths that never draw a map.
 """
 
-import folium
-from folium import plugins
-import pandas as pd
-from typing import List, Dict, Any
+from __future__ import annotations
+
+import os
+import numpy as np
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
+from collections import Counter
+from itertools import chain
 import json
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# Risk bucket lower bounds; bucket i covers [RISK_THRESHOLDS[i-1], RISK_THRESHOLDS[i])
+RISK_THRESHOLDS = np.array([40.0, 60.0, 75.0])
+
+# Per-bucket marker styling, indexed low → critical
+RISK_COLORS = ('green', 'yellow', 'orange', 'red')
+RISK_ICONS = ('ok-sign', 'info-sign', 'warning', 'exclamation-triangle')
+RISK_LABELS = ('LOW', 'MODERATE', 'HIGH', 'CRITICAL')
+
+
+def profile_frame(facility_profiles: List[Any]) -> pd.DataFrame:
+    """
+    Column-per-field view of the profiles
+
+    Build it once and pass it as ``frame`` to the map, statistics and report
+    functions to share it; it is a snapshot, so rebuild it after profiles change.
+    """
+    import pandas as pd
+    
+    return pd.DataFrame({
+        'region': [p.region for p in facility_profiles],
+        'risk': np.array([p.desert_risk_score for p in facility_profiles], dtype=np.float64),
+        'capability': np.array([p.capability_score for p in facility_profiles], dtype=np.float64),
+        'gaps': np.array([len(p.gaps) for p in facility_profiles], dtype=np.int64),
+        'lat': np.array([p.coordinates[0] for p in facility_profiles], dtype=np.float64),
+        'lon': np.array([p.coordinates[1] for p in facility_profiles], dtype=np.float64)
+    })
+
+
+def _risk_buckets(scores: np.ndarray) -> np.ndarray:
+    """Classify every score into a risk bucket (0=low .. 3=critical) in one call"""
+    return np.searchsorted(RISK_THRESHOLDS, scores, side='right')
+
+
+# Output files are written through a 128 KiB buffer, in slices of the same size
+WRITE_BUFFER_SIZE = 1 << 17
+
+
+def _write_html(output_path: str, html: str, cache_key: Optional[str] = None):
+    """Write an HTML document without holding a second, fully encoded copy in memory"""
+    with open(output_path, 'w', encoding='utf-8', newline='', buffering=WRITE_BUFFER_SIZE) as f:
+        for start in range(0, len(html), WRITE_BUFFER_SIZE):
+            f.write(html[start:start + WRITE_BUFFER_SIZE])
+        if cache_key:
+            f.write(cache_key)
+
+
+def _cache_key(source_path: Optional[str], facility_profiles: List[Any]) -> Optional[str]:
+    """
+    Trailing HTML comment identifying the source CSV version (mtime + size) and
+    profile count; None when no source is given, which disables caching
+    """
+    if source_path is None:
+        return None
+    stat = os.stat(source_path)
+    return f"\n<!-- cache-key: {stat.st_mtime_ns}:{stat.st_size}:{len(facility_profiles)} -->\n"
+
+
+def _is_cached(output_path: str, cache_key: Optional[str]) -> bool:
+    """Whether output_path was last written from the same source version"""
+    if cache_key is None:
+        return False
+    expected = cache_key.encode('utf-8')
+    try:
+        with open(output_path, 'rb') as f:
+            # The key is appended, not prepended: a comment before <!DOCTYPE>
+            # would put browsers into quirks mode
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - len(expected)))
+            return f.read() == expected
+    except OSError:
+        return False
+
+
+# Marker popup, parsed once at import; list blocks are rendered by _render_popup
+_POPUP_TEMPLATE = """
+        <div style="width: 300px; font-family: Arial;">
+            <h4 style="margin: 0; color: {color};">{name}</h4>
+            <p style="margin: 5px 0;"><b>Type:</b> {facility_type}</p>
+            <p style="margin: 5px 0;"><b>Region:</b> {region}</p>
+            <p style="margin: 5px 0;"><b>District:</b> {district}</p>
+            
+            <hr style="margin: 10px 0;">
+            
+            <p style="margin: 5px 0;"><b>Desert Risk Score:</b> 
+                <span style="color: {color}; font-weight: bold;">{risk:.1f}/100 ({risk_label})</span>
+            </p>
+            <p style="margin: 5px 0;"><b>Capability Score:</b> {capability:.1f}/100</p>
+            
+            <hr style="margin: 10px 0;">
+            
+            <p style="margin: 5px 0;"><b>Specialties ({specialty_count}):</b></p>
+            <ul style="margin: 5px 0; padding-left: 20px;">
+                {specialties}
+                {specialties_more}
+            </ul>
+            
+            <p style="margin: 5px 0;"><b>Key Equipment ({equipment_count}):</b></p>
+            <ul style="margin: 5px 0; padding-left: 20px;">
+                {equipment}
+                {equipment_more}
+            </ul>
+            
+            {gaps}
+        </div>
+        """
+
+_POPUP_GAPS_TEMPLATE = """
+            <hr style="margin: 10px 0;">
+            <p style="margin: 5px 0; color: red;"><b>⚠️ Critical Gaps ({gap_count}):</b></p>
+            <ul style="margin: 5px 0; padding-left: 20px;">
+                {gaps}
+                {gaps_more}
+            </ul>
+            """
+
+
+def _more_items(items: List[Any], shown: int) -> str:
+    """'...and N more' list item for entries beyond the first `shown`"""
+    if len(items) > shown:
+        return '<li><i>...and ' + str(len(items) - shown) + ' more</i></li>'
+    return ''
+
+
+def _render_popup(profile: Any, color: str, risk_label: str,
+                  _li='<li>{}</li>'.format,
+                  _li_red='<li style="color: red;">{}</li>'.format,
+                  _format_popup=_POPUP_TEMPLATE.format_map,
+                  _format_gaps=_POPUP_GAPS_TEMPLATE.format_map) -> str:
+    """Render the marker popup HTML for one facility"""
+    gaps = profile.gaps
+    specialties = profile.specialties
+    equipment = profile.equipment
+    
+    return _format_popup({
+        'color': color,
+        'name': profile.facility_name,
+        'facility_type': profile.facility_type,
+        'region': profile.region,
+        'district': profile.district,
+        'risk': profile.desert_risk_score,
+        'risk_label': risk_label,
+        'capability': profile.capability_score,
+        'specialty_count': len(specialties),
+        'specialties': ''.join(map(_li, specialties[:5])),
+        'specialties_more': _more_items(specialties, 5),
+        'equipment_count': len(equipment),
+        'equipment': ''.join(map(_li, equipment[:5])),
+        'equipment_more': _more_items(equipment, 5),
+        'gaps': _format_gaps({
+            'gap_count': len(gaps),
+            'gaps': ''.join(map(_li_red, gaps[:3])),
+            'gaps_more': _more_items(gaps, 3)
+        }) if gaps else ''
+    })
 
 def create_medical_desert_map(facility_profiles: List[Any], 
-                              output_path: str = 'medical_desert_map.html'):
+                              output_path: str = 'medical_desert_map.html',
+                              source_path: Optional[str] = None,
+                              frame: Optional[pd.DataFrame] = None):
     """
     Create an interactive map showing medical deserts in Ghana
     
@@ -20,8 +186,19 @@ def create_medical_desert_map(facility_profiles: List[Any],
     - Yellow: Moderate risk
     - Orange: High risk
     - Red: Critical medical desert
+    
+    If source_path (the facility CSV) is given and output_path was already
+    rendered from the same version of it, the existing file is reused.
+    frame is an optional precomputed profile_frame(facility_profiles).
     """
     
+    cache_key = _cache_key(source_path, facility_profiles)
+    if _is_cached(output_path, cache_key):
+        return output_path
+    
+    import folium
+    from folium import plugins
+    
     # Center map on Ghana
     ghana_center = [7.9465, -1.0232]
     m = folium.Map(
@@ -36,79 +213,31 @@ def create_medical_desert_map(facility_profiles: List[Any],
     high_risk = folium.FeatureGroup(name='High Risk')
     critical_risk = folium.FeatureGroup(name='CRITICAL - Medical Desert')
     
+    groups = (low_risk, moderate_risk, high_risk, critical_risk)
+    
+    if frame is None:
+        frame = profile_frame(facility_profiles)
+    scores = frame['risk'].to_numpy()
+    
+    # Bound once; these are looked up for every marker. Markers go straight to
+    # each group's add_child rather than through Marker.add_to
+    Marker, Popup, Icon = folium.Marker, folium.Popup, folium.Icon
+    add_marker = tuple(group.add_child for group in groups)
+    
     # Add facilities to appropriate groups
-    for profile in facility_profiles:
-        lat, lon = profile.coordinates
-        
-        # Determine risk level and color
-        if profile.desert_risk_score >= 75:
-            color = 'red'
-            icon = 'exclamation-triangle'
-            group = critical_risk
-            risk_label = 'CRITICAL'
-        elif profile.desert_risk_score >= 60:
-            color = 'orange'
-            icon = 'warning'
-            group = high_risk
-            risk_label = 'HIGH'
-        elif profile.desert_risk_score >= 40:
-            color = 'yellow'
-            icon = 'info-sign'
-            group = moderate_risk
-            risk_label = 'MODERATE'
-        else:
-            color = 'green'
-            icon = 'ok-sign'
-            group = low_risk
-            risk_label = 'LOW'
+    for profile, bucket in zip(facility_profiles, _risk_buckets(scores).tolist()):
+        color = RISK_COLORS[bucket]
         
         # Create detailed popup
-        popup_html = f"""
-        <div style="width: 300px; font-family: Arial;">
-            <h4 style="margin: 0; color: {color};">{profile.facility_name}</h4>
-            <p style="margin: 5px 0;"><b>Type:</b> {profile.facility_type}</p>
-            <p style="margin: 5px 0;"><b>Region:</b> {profile.region}</p>
-            <p style="margin: 5px 0;"><b>District:</b> {profile.district}</p>
-            
-            <hr style="margin: 10px 0;">
-            
-            <p style="margin: 5px 0;"><b>Desert Risk Score:</b> 
-                <span style="color: {color}; font-weight: bold;">{profile.desert_risk_score:.1f}/100 ({risk_label})</span>
-            </p>
-            <p style="margin: 5px 0;"><b>Capability Score:</b> {profile.capability_score:.1f}/100</p>
-            
-            <hr style="margin: 10px 0;">
-            
-            <p style="margin: 5px 0;"><b>Specialties ({len(profile.specialties)}):</b></p>
-            <ul style="margin: 5px 0; padding-left: 20px;">
-                {''.join([f'<li>{s}</li>' for s in profile.specialties[:5]])}
-                {f'<li><i>...and {len(profile.specialties) - 5} more</i></li>' if len(profile.specialties) > 5 else ''}
-            </ul>
-            
-            <p style="margin: 5px 0;"><b>Key Equipment ({len(profile.equipment)}):</b></p>
-            <ul style="margin: 5px 0; padding-left: 20px;">
-                {''.join([f'<li>{e}</li>' for e in profile.equipment[:5]])}
-                {f'<li><i>...and {len(profile.equipment) - 5} more</i></li>' if len(profile.equipment) > 5 else ''}
-            </ul>
-            
-            {f'''
-            <hr style="margin: 10px 0;">
-            <p style="margin: 5px 0; color: red;"><b>⚠️ Critical Gaps ({len(profile.gaps)}):</b></p>
-            <ul style="margin: 5px 0; padding-left: 20px;">
-                {''.join([f'<li style="color: red;">{g}</li>' for g in profile.gaps[:3]])}
-                {f'<li><i>...and {len(profile.gaps) - 3} more</i></li>' if len(profile.gaps) > 3 else ''}
-            </ul>
-            ''' if profile.gaps else ''}
-        </div>
-        """
+        popup_html = _render_popup(profile, color, RISK_LABELS[bucket])
         
         # Add marker
-        folium.Marker(
-            location=[lat, lon],
-            popup=folium.Popup(popup_html, max_width=350),
+        add_marker[bucket](Marker(
+            location=profile.coordinates,
+            popup=Popup(popup_html, max_width=350),
             tooltip=f"{profile.facility_name} - Risk: {profile.desert_risk_score:.0f}",
-            icon=folium.Icon(color=color, icon=icon, prefix='glyphicon')
-        ).add_to(group)
+            icon=Icon(color=color, icon=RISK_ICONS[bucket], prefix='glyphicon')
+        ))
     
     # Add all groups to map
     low_risk.add_to(m)
@@ -120,8 +249,7 @@ def create_medical_desert_map(facility_profiles: List[Any],
     folium.LayerControl().add_to(m)
     
     # Add regional heat map for desert risk
-    heat_data = [[p.coordinates[0], p.coordinates[1], p.desert_risk_score/100] 
-                 for p in facility_profiles]
+    heat_data = np.column_stack((frame['lat'], frame['lon'], scores / 100)).tolist()
     plugins.HeatMap(heat_data, name='Desert Risk Heatmap', 
                    min_opacity=0.3, radius=25, blur=25,
                    gradient={0.0: 'green', 0.4: 'yellow', 
@@ -146,53 +274,37 @@ def create_medical_desert_map(facility_profiles: List[Any],
     m.get_root().html.add_child(folium.Element(title_html))
     
     # Save map
-    m.save(output_path)
+    _write_html(output_path, m.get_root().render(), cache_key)
     return output_path
 
 
-def create_summary_statistics(facility_profiles: List[Any]) -> Dict[str, Any]:
-    """Generate summary statistics for the dashboard"""
+def _summarize(facility_profiles: List[Any],
+               frame: Optional[pd.DataFrame] = None) -> tuple[Dict[str, Any], pd.DataFrame]:
+    """Summary statistics plus the per-region aggregate frame they were built from"""
     
     total_facilities = len(facility_profiles)
     
-    # Risk distribution
-    critical = sum(1 for p in facility_profiles if p.desert_risk_score >= 75)
-    high = sum(1 for p in facility_profiles if 60 <= p.desert_risk_score < 75)
-    moderate = sum(1 for p in facility_profiles if 40 <= p.desert_risk_score < 60)
-    low = sum(1 for p in facility_profiles if p.desert_risk_score < 40)
-    
-    # Regional analysis
-    region_stats = {}
-    for profile in facility_profiles:
-        region = profile.region
-        if region not in region_stats:
-            region_stats[region] = {
-                'count': 0,
-                'avg_desert_risk': 0,
-                'avg_capability': 0,
-                'total_gaps': 0
-            }
-        
-        region_stats[region]['count'] += 1
-        region_stats[region]['avg_desert_risk'] += profile.desert_risk_score
-        region_stats[region]['avg_capability'] += profile.capability_score
-        region_stats[region]['total_gaps'] += len(profile.gaps)
+    if frame is None:
+        frame = profile_frame(facility_profiles)
     
-    # Calculate averages
-    for region, stats in region_stats.items():
-        count = stats['count']
-        stats['avg_desert_risk'] /= count
-        stats['avg_capability'] /= count
+    # Risk distribution
+    low, moderate, high, critical = np.bincount(
+        _risk_buckets(frame['risk'].to_numpy()), minlength=len(RISK_LABELS)
+    ).tolist()
+    
+    # Regional analysis, in order of first appearance
+    region_frame = frame.groupby('region', sort=False, dropna=False).agg(
+        count=('risk', 'size'),
+        avg_desert_risk=('risk', 'mean'),
+        avg_capability=('capability', 'mean'),
+        total_gaps=('gaps', 'sum')
+    )
     
     # Most common gaps
-    all_gaps = [gap for p in facility_profiles for gap in p.gaps]
-    gap_counts = {}
-    for gap in all_gaps:
-        gap_counts[gap] = gap_counts.get(gap, 0) + 1
+    gap_counter = Counter(chain.from_iterable(p.gaps for p in facility_profiles))
+    top_gaps = gap_counter.most_common(10)
     
-    top_gaps = sorted(gap_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-    
-    return {
+    stats = {
         'total_facilities': total_facilities,
         'risk_distribution': {
             'critical': critical,
@@ -200,19 +312,37 @@ def create_summary_statistics(facility_profiles: List[Any]) -> Dict[str, Any]:
             'moderate': moderate,
             'low': low
         },
-        'regional_stats': region_stats,
+        'regional_stats': region_frame.to_dict('index'),
         'top_gaps': [{'gap': gap, 'count': count} for gap, count in top_gaps],
-        'avg_desert_risk': sum(p.desert_risk_score for p in facility_profiles) / total_facilities,
-        'avg_capability': sum(p.capability_score for p in facility_profiles) / total_facilities
+        'avg_desert_risk': float(frame['risk'].mean()),
+        'avg_capability': float(frame['capability'].mean())
     }
+    return stats, region_frame
+
+
+def create_summary_statistics(facility_profiles: List[Any],
+                              frame: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """Generate summary statistics for the dashboard (frame: optional profile_frame)"""
+    return _summarize(facility_profiles, frame)[0]
 
 
-def generate_regional_report(facility_profiles: List[Any], output_path: str = 'regional_report.html'):
-    """Generate a detailed regional analysis report"""
+def generate_regional_report(facility_profiles: List[Any], output_path: str = 'regional_report.html',
+                             source_path: Optional[str] = None,
+                             frame: Optional[pd.DataFrame] = None):
+    """
+    Generate a detailed regional analysis report
+    
+    Reuses an existing report rendered from the same version of source_path;
+    frame is an optional precomputed profile_frame(facility_profiles).
+    """
     
-    stats = create_summary_statistics(facility_profiles)
+    cache_key = _cache_key(source_path, facility_profiles)
+    if _is_cached(output_path, cache_key):
+        return output_path
     
-    html = f"""
+    stats, region_frame = _summarize(facility_profiles, frame)
+    
+    parts = [f"""
     <!DOCTYPE html>
     <html>
     <head>
@@ -337,15 +467,15 @@ def generate_regional_report(facility_profiles: List[Any], output_path: str = 'r
                     <th>Total Gaps</th>
                     <th>Priority</th>
                 </tr>
-    """
+    """]
     
-    # Sort regions by desert risk
-    sorted_regions = sorted(stats['regional_stats'].items(), 
-                          key=lambda x: x[1]['avg_desert_risk'], 
-                          reverse=True)
+    # Sort regions by desert risk; the stable sort keeps first-appearance order on ties
+    sorted_regions = list(
+        region_frame.sort_values('avg_desert_risk', ascending=False, kind='stable')
+        .itertuples(name=None)
+    )
     
-    for region, data in sorted_regions:
-        risk = data['avg_desert_risk']
+    for region, count, risk, avg_capability, total_gaps in sorted_regions:
         if risk >= 75:
             risk_class = 'risk-critical'
             priority = 'CRITICAL'
@@ -359,18 +489,18 @@ def generate_regional_report(facility_profiles: List[Any], output_path: str = 'r
             risk_class = 'risk-low'
             priority = 'LOW'
         
-        html += f"""
+        parts.append(f"""
                 <tr>
                     <td><b>{region}</b></td>
-                    <td>{data['count']}</td>
+                    <td>{count}</td>
                     <td class="{risk_class}">{risk:.1f}</td>
-                    <td>{data['avg_capability']:.1f}</td>
-                    <td>{data['total_gaps']}</td>
+                    <td>{avg_capability:.1f}</td>
+                    <td>{total_gaps}</td>
                     <td class="{risk_class}">{priority}</td>
                 </tr>
-        """
+        """)
     
-    html += """
+    parts.append("""
             </table>
         </div>
         
@@ -381,47 +511,47 @@ def generate_regional_report(facility_profiles: List[Any], output_path: str = 'r
                     <th>Gap/Need</th>
                     <th>Facilities Affected</th>
                 </tr>
-    """
+    """)
     
     for gap_data in stats['top_gaps']:
-        html += f"""
+        parts.append(f"""
                 <tr>
                     <td>{gap_data['gap']}</td>
                     <td><b>{gap_data['count']}</b></td>
                 </tr>
-        """
+        """)
     
-    html += """
+    parts.append("""
             </table>
         </div>
         
         <div class="summary">
             <h2>Recommendations</h2>
             <ol>
-    """
+    """)
     
     # Generate top 5 recommendations
-    if sorted_regions[0][1]['avg_desert_risk'] >= 70:
-        html += f"<li><b>URGENT:</b> Deploy emergency medical resources to {sorted_regions[0][0]} region (Risk: {sorted_regions[0][1]['avg_desert_risk']:.1f})</li>"
+    top_region, _, top_risk = sorted_regions[0][:3]
+    if top_risk >= 70:
+        parts.append(f"<li><b>URGENT:</b> Deploy emergency medical resources to {top_region} region (Risk: {top_risk:.1f})</li>")
     
     if stats['top_gaps']:
-        html += f"<li>Address the most common gap across facilities: {stats['top_gaps'][0]['gap']} (affects {stats['top_gaps'][0]['count']} facilities)</li>"
+        parts.append(f"<li>Address the most common gap across facilities: {stats['top_gaps'][0]['gap']} (affects {stats['top_gaps'][0]['count']} facilities)</li>")
     
     high_risk_count = stats['risk_distribution']['critical'] + stats['risk_distribution']['high']
     if high_risk_count > 0:
-        html += f"<li>Prioritize specialist recruitment for {high_risk_count} high-risk facilities</li>"
+        parts.append(f"<li>Prioritize specialist recruitment for {high_risk_count} high-risk facilities</li>")
     
-    html += """
+    parts.append("""
                 <li>Establish telemedicine connections between well-resourced and underserved facilities</li>
                 <li>Create mobile surgical units to serve remote districts</li>
             </ol>
         </div>
     </body>
     </html>
-    """
+    """)
     
-    with open(output_path, 'w') as f:
-        f.write(html)
+    _write_html(output_path, ''.join(parts), cache_key)
     
     return output_path
 
@@ -430,17 +560,19 @@ if __name__ == "__main__":
     from document_parser import parse_facility_dataset
     
     # Load data
-    profiles = parse_facility_dataset('/home/claude/medical_desert_agent/ghana_facilities.csv')
+    data_path = '/home/claude/medical_desert_agent/ghana_facilities.csv'
+    profiles = parse_facility_dataset(data_path)
+    frame = profile_frame(profiles)
     
     # Create visualizations
-    map_path = create_medical_desert_map(profiles)
+    map_path = create_medical_desert_map(profiles, source_path=data_path, frame=frame)
     print(f"Created map: {map_path}")
     
-    report_path = generate_regional_report(profiles)
+    report_path = generate_regional_report(profiles, source_path=data_path, frame=frame)
     print(f"Created report: {report_path}")
     
     # Print statistics
-    stats = create_summary_statistics(profiles)
+    stats = create_summary_statistics(profiles, frame)
     print(f"\nStatistics:")
     print(f"  Total facilities: {stats['total_facilities']}")
     print(f"  Critical risk: {stats['risk_distribution']['critical']}")